@@ -0,0 +1,95 @@
+"""Measures the async related-field descriptors of :mod:`versa.fields`.
+
+Run from the repository root::
+
+    python benchmarks/descriptors.py
+
+Reports the time of awaiting a foreign key whose row is already cached,
+its ``_id`` attribute and a foreign key that needs a query, all through
+Django on an in-memory SQLite database.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.configure(
+    INSTALLED_APPS=['versa'],
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3',
+                           'NAME': 'file:benchmark?mode=memory&cache=shared'}},
+)
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from versa import fields  # noqa: E402
+from versa.models import Model  # noqa: E402
+from versa.utils import get_db_executor  # noqa: E402
+
+N = 100000
+REPEAT = 5
+QUERIES = 2000
+
+
+class Parent(Model):
+    name = fields.CharField(max_length=10)
+
+    class Meta:
+        app_label = 'versa'
+
+
+class Child(Model):
+    parent = fields.ForeignKey(Parent, on_delete=fields.CASCADE)
+
+    class Meta:
+        app_label = 'versa'
+
+
+def best_of(func):
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def timed_awaits(awaitable_factory, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        await awaitable_factory()
+    return time.perf_counter() - start
+
+
+async def main(child, parent_id):
+    best = min([await timed_awaits(lambda: child.parent, N) for _ in range(REPEAT)])
+    print(f'cached   await child.parent:    {best / N * 1e6:8.2f} us')
+    best = min([await timed_awaits(lambda: child.parent_id, N) for _ in range(REPEAT)])
+    print(f'loaded   await child.parent_id: {best / N * 1e6:8.2f} us')
+
+    children = [Child(id=1, parent_id=parent_id) for _ in range(QUERIES + 1)]
+    await children.pop().parent  # opens the database thread's connection
+    start = time.perf_counter()
+    for uncached in children:
+        await uncached.parent
+    print(f'uncached await child.parent:    {(time.perf_counter() - start) / QUERIES * 1e6:8.0f} us')
+
+
+if __name__ == '__main__':
+    with connection.schema_editor() as editor:
+        editor.create_model(Parent)
+        editor.create_model(Child)
+    parent = Parent.objects.create(name='parent')
+    Child.objects.create(parent=parent)
+    child = Child.objects.select_related('parent').get()
+
+    best = best_of(lambda: [child.parent for _ in range(N)])
+    print(f'sync     child.parent:          {best / N * 1e6:8.2f} us')
+    asyncio.run(main(child, parent.pk))
+    get_db_executor().shutdown()
@@ -0,0 +1,66 @@
+"""Compares the ``CACHE_SERIALIZER`` options of :mod:`versa.cache`.
+
+Run from the repository root::
+
+    python benchmarks/serializers.py
+
+Serializes the settings of 500 guilds keyed by their IDs with each
+serializer, with and without compression, and reports the payload size
+and the best time of ``dumps`` and ``loads``. JSON gets string keys since
+it can't store integer ones.
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiocache.serializers import JsonSerializer  # noqa: E402
+
+from versa.cache import MsgPackSerializer, PickleSerializer  # noqa: E402
+
+GUILDS = 500
+NUMBER = 200
+REPEAT = 5
+
+
+def guild_settings():
+    rng = random.Random(0)
+    return {
+        1000000000000000000 + i * 7919: {
+            'prefix': '!',
+            'language': 'en',
+            'enabled': bool(i % 2),
+            'channels': [rng.getrandbits(63) for _ in range(5)],
+            'name': f'guild {i}',
+        }
+        for i in range(GUILDS)
+    }
+
+
+def best_time(func):
+    return min(timeit.repeat(func, number=NUMBER, repeat=REPEAT)) / NUMBER
+
+
+def main():
+    value = guild_settings()
+    json_value = {str(key): settings for key, settings in value.items()}
+    cases = (
+        ('json', JsonSerializer(), json_value),
+        ('pickle', PickleSerializer(), value),
+        ('msgpack', MsgPackSerializer(), value),
+        ('pickle+zlib', PickleSerializer(compress_threshold=1), value),
+        ('msgpack+zlib', MsgPackSerializer(compress_threshold=1), value),
+    )
+    for name, serializer, case_value in cases:
+        data = serializer.dumps(case_value)
+        assert serializer.loads(data) == case_value
+        dumps = best_time(lambda: serializer.dumps(case_value))
+        loads = best_time(lambda: serializer.loads(data))
+        print(f'{name:13} {len(data) / 1000:6.1f} kB  dumps {dumps * 1e3:.3f} ms  loads {loads * 1e3:.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
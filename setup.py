@@ -38,7 +38,10 @@ setup_requirements = []
 
 extra_requirements = {
     'redis': ['aioredis>=1.0.0'],
-    'postgresql': ['psycopg2']
+    'postgresql': ['psycopg2'],
+    'asyncpg': ['asyncpg'],
+    'aiosqlite': ['aiosqlite'],
+    'msgpack': ['msgpack']
 }
 
 with codecs.open(os.path.join(here, 'versa', '__init__.py'), encoding='utf-8') as f:
@@ -0,0 +1,47 @@
+import os
+import tempfile
+
+import aiocache
+import pytest
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'versa.django_settings')
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['INSTALLED_APPS'] = 'tests'
+
+from django.conf import settings  # noqa: E402
+
+settings.DATABASES['default']['NAME'] = os.path.join(tempfile.mkdtemp(), 'test_db.sqlite3')
+
+import django  # noqa: E402
+
+django.setup()
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _create_tables():
+    from django.apps import apps
+    from django.db import connection
+    with connection.schema_editor() as schema_editor:
+        for model in apps.get_models():
+            schema_editor.create_model(model)
+
+
+@pytest.fixture
+def cache_config():
+    """Configures an in-memory versa cache."""
+    aiocache.caches.set_config({'default': {
+        'cache': 'versa.cache.BoundedMemoryCache',
+        'namespace': 'test',
+        'serializer': {'class': 'aiocache.serializers.JsonSerializer'},
+    }})
+
+
+@pytest.fixture
+def db():
+    """Deletes the rows the test created once it's done."""
+    yield
+    from django.apps import apps
+    from django.db import connection
+    with connection.constraint_checks_disabled():
+        for model in apps.get_models(include_auto_created=True):
+            model._base_manager.all()._raw_delete(connection.alias)
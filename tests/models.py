@@ -0,0 +1,20 @@
+from django.db import models
+
+from versa import fields
+from versa.models import Model
+
+
+class EmojiHolder(Model):
+    name = fields.CharField(max_length=16)
+    emoji = fields.EmojiField(null=True, on_delete=fields.SET_NULL, related_name='+')
+    emojis = fields.ManyEmojisField(related_name='+')
+
+
+class Tagged(Model):
+    tags = fields.ListField(fields.BigIntegerField())
+    other_tags = fields.ListField(fields.BigIntegerField())
+
+
+class PlainNote(models.Model):
+    """A model with Django's own manager."""
+    text = models.CharField(max_length=16)
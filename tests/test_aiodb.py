@@ -0,0 +1,49 @@
+import pytest
+import pytest_asyncio
+
+from versa import aiodb
+from versa.errors import ConfigurationError
+from versa.models import User
+
+
+def test_async_database_needs_a_driver():
+    with pytest.raises(TypeError):
+        aiodb.AsyncDatabase()
+
+
+@pytest.fixture
+def async_driver(monkeypatch):
+    monkeypatch.setenv('DB_ASYNC_DRIVER', 'true')
+    yield
+    aiodb._database = None
+
+
+def test_init_uses_the_configured_alias(async_driver, monkeypatch):
+    aiodb.init()
+    assert isinstance(aiodb.get_async_database(), aiodb.SQLiteDatabase)
+    assert aiodb.get_async_database().alias == 'default'
+
+    monkeypatch.setenv('DB_ASYNC_ALIAS', 'replica')
+    with pytest.raises(ConfigurationError):
+        aiodb.init()
+
+
+@pytest.fixture
+def users(db):
+    User.objects.bulk_create([User(id=1), User(id=2, is_active=False)])
+
+
+@pytest_asyncio.fixture
+async def database(users):
+    database = aiodb.SQLiteDatabase('default')
+    yield database
+    await database.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_database_runs_orm_queries(database):
+    users = await database.to_list(User.objects.filter(is_active=True))
+
+    assert [(user.id, user._state.db) for user in users] == [(1, 'default')]
+    assert await database.exists(User.objects.filter(id=2))
+    assert await database.first(User.objects.filter(id=3)) is None
@@ -0,0 +1,75 @@
+import pytest
+import pytest_asyncio
+from aiocache.serializers import JsonSerializer
+
+from versa import cache as versa_cache
+from versa.cache import (BoundedMemoryCache, Cache, MsgPackSerializer,
+                         PickleSerializer, TieredCache)
+
+serializers = [JsonSerializer, PickleSerializer, MsgPackSerializer]
+
+
+@pytest.mark.parametrize('serializer_cls', [PickleSerializer, MsgPackSerializer])
+@pytest.mark.parametrize('value', [0, 42, -7, 'text', [1, 2], {'a': 1}])
+def test_serializer_round_trips_every_value_alike(serializer_cls, value):
+    for serializer in (serializer_cls(), serializer_cls(compress_threshold=1)):
+        data = serializer.dumps(value)
+        assert data[:1] in (serializer._raw, serializer._compressed)
+        assert serializer.loads(data) == value
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('serializer_cls', serializers)
+@pytest.mark.parametrize('backend_cls', [BoundedMemoryCache, TieredCache])
+async def test_counters(backend_cls, serializer_cls):
+    if backend_cls is TieredCache:
+        backend = TieredCache(local=True, l2_serializer={'class': f'{serializer_cls.__module__}.'
+                                                                  f'{serializer_cls.__qualname__}'})
+    else:
+        backend = BoundedMemoryCache(serializer=serializer_cls())
+
+    assert await backend.increment('counter', 0) == 0
+    assert await backend.increment('counter', 2) == 2
+    assert await backend.increment('counter', 3) == 5
+    assert await backend.increment('counter', 0) == 5
+    await backend.close()
+
+
+@pytest_asyncio.fixture
+async def cache(cache_config):
+    cache = Cache('tags')
+    yield cache
+    await cache.clear()
+    Cache._local_tags.pop(cache.backend, None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(versa_cache.time, 'monotonic', lambda: clock[0])
+    return clock
+
+
+@pytest.mark.asyncio
+async def test_invalidate_tag_deletes_the_tagged_keys(cache):
+    await cache.set('a', 1, tags=('t',))
+    await cache.set_many({'b': 2, 'c': 3}, tags=('t', 'u'))
+    await cache.set('d', 4)
+
+    assert await cache.invalidate_tag('t') == 3
+    assert await cache.get_many('abcd') == {'d': 4}
+    assert await cache.invalidate_tag('u') == 0
+
+
+@pytest.mark.asyncio
+async def test_local_tags_drop_expired_keys(cache, clock):
+    await cache.set('kept', 0, tags=('t',))
+    await cache.set_many({str(i): i for i in range(100)}, ttl=10, tags=('t',))
+    clock[0] += 11
+    # doubles the number of keys since the last pruning
+    await cache.set_many({f'new{i}': i for i in range(101)}, ttl=10, tags=('t',))
+
+    local_tag = Cache._local_tags[cache.backend]['t']
+    assert len(local_tag.keys) == 102
+    assert 'kept' in local_tag.keys
+    assert await cache.invalidate_tag('t') == 102
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+
+from versa.conversation import Conversation, ConversationManager
+from versa.errors import ConversationAlreadyRunning
+
+
+class Poll(Conversation):
+    async def on_vote(self, payload):
+        if str(payload.emoji) == '!':
+            raise RuntimeError("step failed")
+        if str(payload.emoji) not in ('+', '-'):
+            return 'vote'
+        self.data['vote'] = str(payload.emoji)
+        return None
+
+
+@pytest_asyncio.fixture
+async def manager(cache_config):
+    manager = ConversationManager(SimpleNamespace(user=SimpleNamespace(id=0)))
+    yield manager
+    await manager.cache.clear()
+
+
+def reaction(emoji, message_id=10, user_id=2):
+    return SimpleNamespace(emoji=emoji, message_id=message_id, user_id=user_id)
+
+
+async def start_poll(manager):
+    poll = Poll(manager.core, channel_id=1, user_id=2)
+    poll.expect_reaction(10)
+    await manager._advance(poll, 'vote', replace=False)
+    return poll
+
+
+@pytest.mark.asyncio
+async def test_reaction_step_keeps_waiting_for_reactions(manager):
+    await start_poll(manager)
+
+    await manager.dispatch_reaction(reaction('?'))
+
+    state = await manager.cache.get(manager.reaction_key(10, 2))
+    assert state['step'] == 'vote' and state['message_id'] == 10
+    assert not await manager.cache.exists(manager.message_key(1, 2))
+
+    await manager.dispatch_reaction(reaction('+'))
+
+    assert not await manager.cache.exists(manager.reaction_key(10, 2))
+
+
+@pytest.mark.asyncio
+async def test_failing_step_keeps_the_conversation(manager):
+    await start_poll(manager)
+
+    with pytest.raises(RuntimeError):
+        await manager.dispatch_reaction(reaction('!'))
+
+    assert (await manager.cache.get(manager.reaction_key(10, 2)))['step'] == 'vote'
+
+
+@pytest.mark.asyncio
+async def test_running_conversation_is_not_replaced(manager):
+    await start_poll(manager)
+
+    with pytest.raises(ConversationAlreadyRunning):
+        await start_poll(manager)
@@ -0,0 +1,63 @@
+from versa.command import Group, command, command_path
+from versa.core import Core
+
+
+def make_core():
+    # only the command registry of a Core, without connecting anything
+    core = Core.__new__(Core)
+    core.all_commands = {}
+    core.case_insensitive = False
+    core.dispatch_table = {}
+    return core
+
+
+async def noop(ctx):
+    pass
+
+
+def add_grouped_commands(core):
+    settings = Group(noop, name='settings')
+    prefix = command(name='settings_prefix', aliases=['settings_pre'])(noop)
+    core.add_command(settings)
+    core.add_command(prefix)
+    # what Core._resolve_groups does for settings_prefix
+    settings.add_command(prefix)
+    core._add_paths(prefix)
+    return settings, prefix
+
+
+def test_command_path_follows_the_parent_groups():
+    outer = Group(noop, name='a')
+    inner = Group(noop, name='a_b')
+    leaf = command(name='a_b_c_d')(noop)
+    outer.add_command(inner)
+    inner.add_command(leaf)
+
+    assert command_path(inner) == ('a', 'b')
+    assert command_path(leaf) == ('a', 'b', 'c_d')
+    assert command_path(command(name='top_level')(noop)) == ('top_level',)
+
+
+def test_dispatch_table_contains_the_grouped_paths():
+    core = make_core()
+    settings, prefix = add_grouped_commands(core)
+
+    core.compile_dispatch_table()
+
+    assert core.dispatch_table[('settings', 'prefix')] is prefix
+    assert core.dispatch_table[('settings', 'pre')] is prefix
+    assert core.dispatch_table[('settings',)] is settings
+
+
+def test_removing_an_alias_keeps_the_command():
+    core = make_core()
+    _, prefix = add_grouped_commands(core)
+
+    core.remove_command('settings_pre')
+
+    assert ('settings', 'pre') not in core.dispatch_table
+    assert core.dispatch_table[('settings', 'prefix')] is prefix
+
+    core.remove_command('settings_prefix')
+
+    assert prefix not in core.dispatch_table.values()
@@ -0,0 +1,113 @@
+import datetime
+
+import pytest
+from discord.utils import time_snowflake
+from django.core.exceptions import FieldError
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+
+from versa.models import Emoji, User
+
+from .models import EmojiHolder, Tagged
+
+
+def create_emoji(pk):
+    return Emoji.objects.create(id=pk, name=str(pk), is_custom=True)
+
+
+def create_holder(emoji_id, *many_emoji_ids):
+    holder = EmojiHolder.objects.create(name='holder', emoji=create_emoji(emoji_id))
+    holder.emojis.add(*(create_emoji(pk) for pk in many_emoji_ids))
+    return holder
+
+
+def test_reverse_cascade_deletes_emojis_of_deleted_rows(db):
+    create_holder(1, 2, 3)
+    create_holder(4, 5)
+    kept = create_holder(6, 7)
+
+    EmojiHolder.objects.exclude(pk=kept.pk).delete()
+
+    assert sorted(Emoji.objects.values_list('pk', flat=True)) == [6, 7]
+
+
+def test_reverse_cascade_of_single_row(db):
+    holder = create_holder(1, 2)
+
+    holder.delete()
+
+    assert not Emoji.objects.exists()
+
+
+def test_reverse_cascade_queries_once_per_deletion(db):
+    for i in range(5):
+        create_holder(10 * i + 1, 10 * i + 2, 10 * i + 3)
+
+    with CaptureQueriesContext(connection) as context:
+        EmojiHolder.objects.all().delete()
+
+    emoji_deletes = [query for query in context.captured_queries
+                     if query['sql'].startswith('DELETE FROM "versa_emoji"')]
+    assert len(emoji_deletes) == 1
+    assert not Emoji.objects.exists()
+
+
+NOW = datetime.datetime(2022, 6, 1, tzinfo=datetime.timezone.utc)
+
+
+def create_users_around(moment):
+    hour = datetime.timedelta(hours=1)
+    ids = [time_snowflake(moment - hour), time_snowflake(moment), time_snowflake(moment, high=True),
+           time_snowflake(moment + hour)]
+    User.objects.bulk_create([User(id=pk) for pk in ids])
+    return ids
+
+
+def test_created_lookups_compile_to_integer_comparisons():
+    after = User.objects.filter(id__created_after=NOW).query
+    before = User.objects.filter(id__created_before=NOW).query
+
+    sql, params = after.get_compiler(using='default').as_sql()
+    assert '"versa_user"."id" > %s' in sql
+    assert params == (time_snowflake(NOW, high=True),)
+    sql, params = before.get_compiler(using='default').as_sql()
+    assert '"versa_user"."id" < %s' in sql
+    assert params == (time_snowflake(NOW),)
+
+
+def test_created_lookups_exclude_the_moment_itself(db):
+    earlier, first, last, later = create_users_around(NOW)
+
+    assert list(User.objects.filter(id__created_after=NOW).values_list('id', flat=True)) == [later]
+    assert list(User.objects.filter(id__created_before=NOW).values_list('id', flat=True)) == [earlier]
+    assert sorted(User.objects.exclude(id__created_after=NOW).exclude(id__created_before=NOW)
+                  .values_list('id', flat=True)) == [first, last]
+
+
+def tagged_pks(**lookup):
+    return sorted(Tagged.objects.filter(**lookup).values_list('pk', flat=True))
+
+
+def test_list_lookups(db):
+    first = Tagged.objects.create(tags=[1, 2])
+    second = Tagged.objects.create(tags=[2, 3])
+    Tagged.objects.create(tags=[])
+
+    assert tagged_pks(tags__contains=2) == [first.pk, second.pk]
+    assert tagged_pks(tags__contains=1) == [first.pk]
+    assert tagged_pks(tags__overlap=[3, 4]) == [second.pk]
+    assert tagged_pks(tags__overlap=[]) == []
+    assert Tagged.objects.get(pk=first.pk).tags == [1, 2]
+
+
+@pytest.mark.parametrize('lookup', ['icontains', 'startswith', 'gt'])
+def test_list_field_rejects_text_and_comparison_lookups(lookup):
+    with pytest.raises(FieldError, match='Unsupported lookup'):
+        Tagged.objects.filter(**{f'tags__{lookup}': '1'})
+
+
+@pytest.mark.parametrize('lookup', ['contains', 'overlap'])
+def test_list_lookups_reject_expressions(lookup):
+    with pytest.raises(FieldError, match=f'{lookup} lookup of a ListField only takes values'):
+        Tagged.objects.filter(**{f'tags__{lookup}': F('other_tags')})
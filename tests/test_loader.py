@@ -0,0 +1,23 @@
+import asyncio
+
+import pytest
+
+from versa.loader import BatchLoader
+
+from .models import PlainNote
+
+
+@pytest.fixture
+def notes(db):
+    return PlainNote.objects.bulk_create([PlainNote(text='a'), PlainNote(text='b')])
+
+
+@pytest.mark.asyncio
+async def test_batch_loader_loads_models_with_django_managers(notes):
+    loader = BatchLoader.for_model(PlainNote)
+
+    first, second = await asyncio.gather(loader.load(notes[0].pk), loader.load(notes[1].pk))
+
+    assert (first.text, second.text) == ('a', 'b')
+    with pytest.raises(PlainNote.DoesNotExist):
+        await loader.load(0)
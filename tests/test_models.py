@@ -0,0 +1,97 @@
+import discord
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from versa.errors import InactiveUser, UserDoesNotExist
+from versa.models import Guild, Member, TextChannel, User
+from versa.utils import MockMember
+
+
+@pytest.fixture
+def index():
+    User.index.load(())
+    yield User.index
+    User.index.loaded = False
+
+
+def test_user_missing_from_index_is_looked_up(db, index):
+    # bulk_create sends no post_save, like a user registered by another process
+    User.objects.bulk_create([User(id=1)])
+
+    user, _ = User.sync_from_discord_obj(discord.Object(id=1))
+
+    assert user.id == 1
+    assert index.get(1) is True
+
+
+def test_unregistered_user_is_not_indexed(db, index):
+    with pytest.raises(UserDoesNotExist):
+        User.sync_from_discord_obj(discord.Object(id=1))
+    assert index.get(1) is None
+
+
+def test_inactive_user_is_indexed(db, index):
+    User.objects.bulk_create([User(id=1, is_active=False)])
+
+    with pytest.raises(InactiveUser):
+        User.sync_from_discord_obj(discord.Object(id=1))
+    assert index.get(1) is False
+
+
+def test_many_users_missing_from_index_are_looked_up(db, index):
+    User.objects.bulk_create([User(id=1), User(id=2)])
+
+    users = User.sync_from_discord_objs([discord.Object(id=2), discord.Object(id=1)])
+
+    assert [user.id for user in users] == [2, 1]
+    assert index.get(1) is index.get(2) is True
+
+
+@pytest.fixture
+def auto_ids():
+    Member._auto_ids.clear()
+    yield Member._auto_ids
+    Member._auto_ids.clear()
+
+
+def test_member_auto_id_is_created_once(db, auto_ids):
+    User.objects.bulk_create([User(id=1)])
+    Guild.objects.create(id=2)
+
+    auto_id, existed_already = Member.get_or_create_auto_id(1, 2)
+    assert not existed_already
+    auto_ids.clear()
+    assert Member.get_or_create_auto_id(1, 2) == (auto_id, True)
+    assert Member.objects.get().pk == auto_id
+
+
+def test_member_auto_ids_evict_the_oldest_entry(auto_ids, monkeypatch):
+    monkeypatch.setattr(Member, '_auto_ids_max_size', 2)
+
+    for auto_id, key in enumerate([(1, 1), (2, 1), (1, 1), (3, 1)]):
+        Member._cache_auto_id(*key, auto_id)
+
+    assert list(auto_ids.items()) == [((2, 1), 1), ((3, 1), 3)]
+
+
+@pytest.fixture
+def notified_guild(db):
+    User.objects.bulk_create([User(id=1)])
+    guild = Guild.objects.create(id=2)
+    guild.notifications_channel = TextChannel.objects.create(id=3, guild=guild)
+    guild.save()
+    return guild
+
+
+@pytest.mark.parametrize('many', [False, True])
+def test_member_lookups_join_the_related_plan(notified_guild, auto_ids, many):
+    related = ('guild__notifications_channel',)
+    if many:
+        member, = Member.sync_from_discord_objs([MockMember(1, 2)], related=related)
+    else:
+        member, _ = Member.sync_from_discord_obj(MockMember(1, 2), related=related)
+
+    with CaptureQueriesContext(connection) as queries:
+        assert member.guild.notifications_channel.id == 3
+    assert len(queries) == 0
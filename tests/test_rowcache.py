@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from versa.models import User
+from versa.rowcache import RowCache
+
+
+@pytest_asyncio.fixture
+async def row_cache(cache_config):
+    row_cache = RowCache()
+    yield row_cache
+    await row_cache.backend.clear()
+
+
+@pytest.mark.asyncio
+async def test_rows_are_decoded_for_the_database_read_from(row_cache):
+    await row_cache.set_many(User, [User(id=1, is_staff=True)], row_cache.generation(User))
+
+    user = (await row_cache.get_many(User, [1, 2], 'replica'))[1]
+
+    assert (user.id, user.is_staff, user._state.db) == (1, True, 'replica')
+
+
+@pytest.mark.asyncio
+async def test_rows_read_before_an_invalidation_are_not_cached(row_cache):
+    generation = row_cache.generation(User)
+    row_cache.invalidate(User, 2)
+
+    await row_cache.set_many(User, [User(id=1)], generation)
+
+    assert await row_cache.get_many(User, [1], 'default') == {}
+
+
+@pytest.mark.asyncio
+async def test_invalidation_from_a_database_thread_is_seen_by_the_next_read(row_cache):
+    await row_cache.set_many(User, [User(id=1)], row_cache.generation(User))
+    row_cache.loop = asyncio.get_running_loop()
+
+    await asyncio.get_running_loop().run_in_executor(None, row_cache.invalidate, User, 1)
+
+    assert await row_cache.get_many(User, [1], 'default') == {}
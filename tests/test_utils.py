@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+import pytest
+from django.db import connections
+
+from versa.models import User
+from versa.utils import CoalescingCache, DatabaseExecutor
+
+
+@pytest.mark.asyncio
+async def test_coalescing_cache_runs_concurrent_fetches_once():
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key * 2
+
+    cache = CoalescingCache(fetch)
+
+    assert await asyncio.gather(cache.get(1), cache.get(1), cache.get(2)) == [2, 2, 4]
+    assert await cache.get(1) == 2
+    assert calls == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_coalescing_cache_evicts_the_oldest_value_when_full():
+    async def fetch(key):
+        return key
+
+    cache = CoalescingCache(fetch)
+    cache.max_size = 3
+
+    for key in (1, 2, 3, 4):
+        await cache.get(key)
+
+    assert list(cache._values) == [2, 3, 4]
+
+
+def connection_after_query():
+    User.objects.exists()
+    return connections['default']
+
+
+def test_database_executor_closes_each_thread_connection_on_shutdown(db):
+    executor = DatabaseExecutor(max_workers=2, serialize_writes=True)
+    barrier = threading.Barrier(2)
+
+    def read():
+        # keeps both read threads busy so each one opens a connection
+        barrier.wait(timeout=5)
+        return connection_after_query()
+
+    futures = [executor.submit(read), executor.submit(read), executor.submit(connection_after_query, write=True)]
+    wrappers = [future.result() for future in futures]
+    assert len({id(wrapper) for wrapper in wrappers}) == 3
+    assert all(wrapper.connection is not None for wrapper in wrappers)
+
+    executor.shutdown()
+
+    assert all(wrapper.connection is None for wrapper in wrappers)
@@ -76,15 +76,17 @@ builtins._ = translate
 from discord.ext.commands import BucketType, Context, check, command, cooldown
 
 # from .perms import (BotPermission, BotPermissions, BotPermissionsEnum)
-from .cache import cached, get_cache
+from .cache import Cache, cached, get_cache
 from .cog import Cog, listener
 from .command import Command, Group, command, group
 from .conf import Config, Extension, ExtensionConfig
 from .controller import Controller
+from .conversation import Conversation
 from .core import Core
 from .db import Database
 from .errors import ConfigurationError, InvalidArgument, ObjectDoesNotExist
-from .utils import async_using_db
+from .loader import prefetch
+from .utils import async_using_db, async_writing_db
 
 aiocache_logger.setLevel('WARNING')
 
@@ -0,0 +1,269 @@
+"""versa-framework: A framework to make discord bots
+
+:copyright: (c) 2022 devcbezerra.
+:license: Apache-2.0 OR MIT
+"""
+
+import abc
+import asyncio
+import os
+import re
+
+from django.conf import settings as django_settings
+from django.core.exceptions import EmptyResultSet, SynchronousOnlyOperation
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.query import ModelIterable, get_related_populators
+
+from .errors import ConfigurationError
+
+# same as django.db.models.query.MAX_GET_RESULTS
+MAX_GET_RESULTS = 21
+
+_placeholder_pattern = re.compile(r'%([%s])')
+
+
+class AsyncDatabase(abc.ABC):
+    """Runs SQL compiled by Django's ORM on a native asyncio database
+    driver, bypassing the :class:`~versa.utils.DatabaseExecutor`.
+
+    Only read queries of the database ``alias`` that Django can compile
+    without a database connection are run this way; everything else keeps
+    using :data:`~versa.utils.async_using_db`.
+
+    :param str alias:
+        The alias of the Django database.
+    """
+
+    def __init__(self, alias=DEFAULT_DB_ALIAS):
+        self.alias = alias
+        self.settings_dict = django_settings.DATABASES[alias]
+        self._connect_lock = None
+        self._connected = False
+
+    @abc.abstractmethod
+    async def connect(self):
+        """Connects to the database; called before the first query."""
+
+    @abc.abstractmethod
+    async def close(self):
+        """Closes the connections; the next query connects again."""
+
+    @abc.abstractmethod
+    async def execute(self, sql, params):
+        """Runs ``sql``, which uses Django's ``%s`` placeholders, and
+        returns the rows as tuples."""
+
+    async def fetch(self, sql, params):
+        if not self._connected:
+            if self._connect_lock is None:
+                self._connect_lock = asyncio.Lock()
+            async with self._connect_lock:
+                if not self._connected:
+                    await self.connect()
+                    self._connected = True
+        return await self.execute(sql, params)
+
+    def supports(self, queryset):
+        """Whether ``queryset`` can be evaluated by this driver."""
+        query = queryset.query
+        return (queryset.db == self.alias
+                and queryset._result_cache is None
+                and queryset._iterable_class is ModelIterable
+                and not queryset._prefetch_related_lookups
+                and not queryset._known_related_objects
+                and not query.combinator
+                and not query.distinct)
+
+    async def fetch_rows(self, query):
+        """Compiles ``query`` and returns the compiler and the raw rows.
+
+        Raises :exc:`~django.core.exceptions.SynchronousOnlyOperation` if
+        compiling the query requires a synchronous database connection.
+        """
+        compiler = query.get_compiler(using=self.alias)
+        try:
+            sql, params = compiler.as_sql()
+        except EmptyResultSet:
+            return compiler, []
+        rows = await self.fetch(sql, params)
+        if compiler.has_extra_select:
+            rows = [row[:compiler.col_count] for row in rows]
+        return compiler, rows
+
+    async def to_list(self, queryset):
+        compiler, rows = await self.fetch_rows(queryset.query)
+        if not rows:
+            return []
+        # this mirrors django.db.models.query.ModelIterable
+        select, klass_info, annotation_col_map = compiler.select, compiler.klass_info, compiler.annotation_col_map
+        model_cls = klass_info['model']
+        select_fields = klass_info['select_fields']
+        model_fields_start, model_fields_end = select_fields[0], select_fields[-1] + 1
+        init_list = [f[0].target.attname for f in select[model_fields_start:model_fields_end]]
+        related_populators = get_related_populators(klass_info, select, self.alias)
+        objs = []
+        for row in compiler.results_iter([rows]):
+            obj = model_cls.from_db(self.alias, init_list, row[model_fields_start:model_fields_end])
+            for rel_populator in related_populators:
+                rel_populator.populate(row, obj)
+            if annotation_col_map:
+                for attr_name, col_pos in annotation_col_map.items():
+                    setattr(obj, attr_name, row[col_pos])
+            objs.append(obj)
+        return objs
+
+    async def get(self, queryset, *args, **kwargs):
+        clone = queryset.filter(*args, **kwargs)
+        if queryset.query.can_filter() and not queryset.query.distinct_fields:
+            clone = clone.order_by()
+        clone.query.set_limits(high=MAX_GET_RESULTS)
+        objs = await self.to_list(clone)
+        num = len(objs)
+        if num == 1:
+            return objs[0]
+        model = queryset.model
+        if not num:
+            raise model.DoesNotExist(f"{model._meta.object_name} matching query does not exist.")
+        raise model.MultipleObjectsReturned(
+            f"get() returned more than one {model._meta.object_name} -- it returned "
+            f"{num if num < MAX_GET_RESULTS else 'more than %s' % (MAX_GET_RESULTS - 1)}!"
+        )
+
+    async def first(self, queryset):
+        queryset = queryset if queryset.ordered else queryset.order_by('pk')
+        objs = await self.to_list(queryset[:1])
+        return objs[0] if objs else None
+
+    async def exists(self, queryset):
+        queryset = queryset.values_list('pk')
+        if queryset.query.can_filter():
+            queryset = queryset.order_by()
+        queryset.query.set_limits(high=1)
+        _, rows = await self.fetch_rows(queryset.query)
+        return bool(rows)
+
+
+class PostgresDatabase(AsyncDatabase):
+    """Uses `asyncpg <https://github.com/MagicStack/asyncpg>`__."""
+
+    _pool = None
+
+    async def connect(self):
+        try:
+            import asyncpg
+        except ImportError:
+            raise ConfigurationError("DB_ASYNC_DRIVER requires asyncpg when using PostgreSQL; "
+                                     "install versa-framework[asyncpg]")
+        self._pool = await asyncpg.create_pool(
+            database=self.settings_dict['NAME'],
+            user=self.settings_dict['USER'],
+            password=self.settings_dict['PASSWORD'],
+            host=self.settings_dict['HOST'],
+            port=self.settings_dict['PORT'],
+            min_size=1,
+            max_size=int(os.getenv('DB_ASYNC_POOL_SIZE', 10))
+        )
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+        self._connected = False
+
+    async def execute(self, sql, params):
+        counter = iter(range(1, len(params) + 1))
+        sql = _placeholder_pattern.sub(lambda m: '%' if m.group(1) == '%' else f'${next(counter)}', sql)
+        rows = await self._pool.fetch(sql, *params)
+        return [tuple(row) for row in rows]
+
+
+class SQLiteDatabase(AsyncDatabase):
+    """Uses `aiosqlite <https://github.com/omnilib/aiosqlite>`__.
+
+    The connection is created by Django's SQLite backend, so it has the
+    SQL functions (e.g. ``REGEXP``) and converters Django's queries rely on.
+    """
+
+    _connection = None
+
+    async def connect(self):
+        try:
+            import aiosqlite
+        except ImportError:
+            raise ConfigurationError("DB_ASYNC_DRIVER requires aiosqlite when using SQLite; "
+                                     "install versa-framework[aiosqlite]")
+        wrapper = connections[self.alias]
+        # aiosqlite calls the connector on its own thread
+        self._connection = await aiosqlite.Connection(
+            lambda: wrapper.get_new_connection(wrapper.get_connection_params()),
+            iter_chunk_size=64
+        )
+
+    async def close(self):
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+        self._connected = False
+
+    async def execute(self, sql, params):
+        sql = _placeholder_pattern.sub(lambda m: '%' if m.group(1) == '%' else '?', sql)
+        async with self._connection.execute(sql, params) as cursor:
+            return await cursor.fetchall()
+
+
+_database = None
+
+
+def get_async_database():
+    """Returns the :class:`AsyncDatabase` in use or ``None`` if the
+    native async driver is disabled."""
+    return _database
+
+
+async def run(method, queryset, *args, **kwargs):
+    """Runs ``method`` of the :class:`AsyncDatabase` on ``queryset`` if
+    possible. Returns ``NotImplemented`` otherwise so the caller can
+    fall back to the :class:`~versa.utils.DatabaseExecutor`.
+    """
+    database = _database
+    if database is None or not database.supports(queryset):
+        return NotImplemented
+    try:
+        return await getattr(database, method)(queryset, *args, **kwargs)
+    except SynchronousOnlyOperation:
+        return NotImplemented
+
+
+async def close():
+    if _database is not None:
+        await _database.close()
+
+
+_databases = {
+    'postgresql': PostgresDatabase,
+    'sqlite': SQLiteDatabase,
+}
+
+
+def init(alias=None):
+    """Sets up the native async driver if ``DB_ASYNC_DRIVER`` is enabled.
+    Django needs to be set up already.
+
+    :param str alias:
+        The alias of the database to use the driver for; defaults to
+        ``DB_ASYNC_ALIAS`` or ``default``.
+    """
+    global _database
+    if os.getenv('DB_ASYNC_DRIVER', '').lower() not in ('1', 'true', 'yes'):
+        _database = None
+        return
+    if alias is None:
+        alias = os.getenv('DB_ASYNC_ALIAS') or DEFAULT_DB_ALIAS
+    if alias not in django_settings.DATABASES:
+        raise ConfigurationError(f"DB_ASYNC_ALIAS {alias} is not a configured database")
+    vendor = connections[alias].vendor
+    try:
+        database_cls = _databases[vendor]
+    except KeyError:
+        raise ConfigurationError(f"DB_ASYNC_DRIVER is not supported for {vendor} databases") from None
+    _database = database_cls(alias)
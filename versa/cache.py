@@ -4,13 +4,39 @@
 :license: Apache-2.0 OR MIT
 """
 
+import asyncio
+import functools
+import json
+import logging
+import math
 import os
+import pickle
+import random
+import sys
+import time
+import uuid
+import weakref
+import zlib
+from collections import OrderedDict
 
 import aiocache
 import versa
+from aiocache.base import BaseCache
+from aiocache.serializers import BaseSerializer, JsonSerializer
+from discord.utils import maybe_coroutine
 
 from .errors import ConfigurationError
 
+logger = logging.getLogger(__name__)
+
+_missing = object()
+
+
+def _is_redis_cache(backend):
+    # aiocache only defines RedisCache if its redis dependency is installed
+    redis_cache_cls = getattr(aiocache, 'RedisCache', None)
+    return redis_cache_cls is not None and isinstance(backend, redis_cache_cls)
+
 
 def get_cache(namespace=None):
     if namespace is None:
@@ -37,6 +63,12 @@ class Cache:
     This class is mainly used to store keys into and retrieve keys
     from the cache.
 
+    The ``*_many`` methods take one round-trip in redis mode (``MGET``,
+    a ``MULTI``/``EXEC`` pipeline and a single ``DEL``). Keys can be
+    tagged when they are set so all keys with a tag can be deleted at once
+    with :meth:`invalidate_tag`. Methods of the backend that the
+    :class:`Cache` doesn't define are available on it as well.
+
     :param extension:
         If specified, the :class:`Cache` stores data in the
         extension's own namespace.
@@ -44,6 +76,10 @@ class Cache:
     :param core:
         The core.
     :type core: versa.Core
+    :param ttl:
+        The default time to live (in seconds) of keys set through
+        the :class:`Cache`. ``None`` means keys don't expire.
+    :type ttl: typing.Optional[int]
     :ivar backend:
         The cache backend the :class:`Cache` connects to.
     :ivar extension:
@@ -52,17 +88,771 @@ class Cache:
     :ivar core:
         The core.
     """
-    def __init__(self, extension=None, core=None, loop=None):
+
+    tag_prefix = '_tag:'
+
+    # backend -> tag -> _LocalTag, for backends that only live in this process;
+    # shared by the Caches of a backend and dropped with it
+    _local_tags = weakref.WeakKeyDictionary()
+
+    def __init__(self, extension=None, core=None, loop=None, ttl=None):
         self.backend = get_cache(extension)
         self.extension = extension
         self.bot = core
+        self.ttl = ttl
         if loop is None and self.bot is not None and hasattr(self.bot, 'loop'):
             self.loop = self.bot.loop
         else:
             self.loop = loop
 
+    def __getattr__(self, name):
+        if name == 'backend':
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    @property
+    def _redis(self):
+        """The Redis cache of the backend, or ``None`` if it doesn't use Redis."""
+        backend = self.backend
+        if isinstance(backend, TieredCache):
+            backend = backend.l2
+        if _is_redis_cache(backend):
+            return backend
+        return None
+
+    def _build_key(self, key):
+        build_key = getattr(self.backend, 'build_key', None) or self.backend._build_key
+        return build_key(key)
+
+    def _ttl(self, ttl):
+        return self.ttl if ttl is None else ttl
+
+    async def get(self, key, default=None, **kwargs):
+        return await self.backend.get(key, default=default, **kwargs)
+
+    async def set(self, key, value, ttl=None, tags=(), **kwargs):
+        """Sets ``key`` to ``value``.
+
+        :param ttl:
+            The time to live in seconds; defaults to the :class:`Cache`'s.
+        :param tags:
+            Tags to add the key to.
+        """
+        result = await self.backend.set(key, value, ttl=self._ttl(ttl), **kwargs)
+        if tags:
+            await self._tag((key,), tags, self._ttl(ttl))
+        return result
+
+    async def delete(self, key, **kwargs):
+        return await self.backend.delete(key, **kwargs)
+
+    async def exists(self, key, **kwargs):
+        return await self.backend.exists(key, **kwargs)
+
+    async def incr(self, key, delta=1):
+        """Increments the counter ``key`` by ``delta`` and returns its new
+        value; missing counters start at 0.
+
+        Counters are kept in the backend's own format (e.g. the decimal text
+        of Redis' ``INCRBY``), so read them with :meth:`get_counter` instead
+        of :meth:`get`.
+        """
+        return await self.backend.increment(key, delta)
+
+    async def get_counter(self, key):
+        """Returns the value of the counter ``key``; missing counters are 0."""
+        return await self.backend.increment(key, 0)
+
+    async def get_many(self, keys):
+        """Returns a dict of the values of ``keys``; missing keys are left out."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = await self.backend.multi_get(keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    async def set_many(self, mapping, ttl=None, tags=()):
+        """Sets all keys of the dict ``mapping`` to their values.
+
+        :param ttl:
+            The time to live in seconds; defaults to the :class:`Cache`'s.
+        :param tags:
+            Tags to add the keys to.
+        """
+        if not mapping:
+            return
+        await self.backend.multi_set(list(mapping.items()), ttl=self._ttl(ttl))
+        if tags:
+            await self._tag(mapping, tags, self._ttl(ttl))
+
+    async def delete_many(self, keys):
+        """Deletes ``keys`` and returns how many of them existed."""
+        keys = list(keys)
+        if not keys:
+            return 0
+        if _is_redis_cache(self.backend):
+            return await self.backend.raw('delete', *(self._build_key(key) for key in keys))
+        results = await asyncio.gather(*(self.backend.delete(key) for key in keys))
+        return sum(results)
+
+    async def _tag(self, keys, tags, ttl):
+        redis = self._redis
+        if redis is None:
+            tagged = self._local_tags.setdefault(self.backend, {})
+            deadline = time.monotonic() + ttl if ttl else None
+            for tag in tags:
+                tagged.setdefault(tag, _LocalTag()).add(keys, deadline)
+            return
+        keys = [self._build_key(key) for key in keys]
+        await asyncio.gather(*(self._redis_tag(redis, self._build_key(self.tag_prefix + tag), keys, ttl)
+                               for tag in tags))
+
+    @staticmethod
+    async def _redis_tag(redis, tag_key, keys, ttl):
+        # the tag set lives as long as its longest-lived key
+        current_ttl = await redis.raw('ttl', tag_key)
+        await redis.raw('sadd', tag_key, *keys)
+        if not ttl:
+            await redis.raw('persist', tag_key)
+        elif current_ttl == -2 or 0 <= current_ttl < ttl:
+            # -2: the set didn't exist, -1: a key of it doesn't expire
+            await redis.raw('expire', tag_key, ttl)
+
+    async def invalidate_tag(self, tag):
+        """Deletes all keys with the tag ``tag`` and returns how many existed."""
+        redis = self._redis
+        if redis is None:
+            local_tag = self._local_tags.get(self.backend, {}).pop(tag, None)
+            return await self.delete_many(local_tag.live_keys() if local_tag is not None else ())
+        tag_key = self._build_key(self.tag_prefix + tag)
+        keys = await redis.raw('smembers', tag_key)
+        if not keys:
+            return 0
+        keys = [key.decode() if isinstance(key, bytes) else key for key in keys]
+        if redis is self.backend:
+            count = await redis.raw('delete', *keys)
+        else:
+            # the keys have to be invalidated in the other processes' L1 as well
+            count = sum(await asyncio.gather(*(self.backend._delete(key) for key in keys)))
+        await redis.raw('delete', tag_key)
+        return count
+
+
+class _LocalTag:
+    """The keys with a tag and when they expire. Expired keys are pruned
+    whenever the number of keys has doubled since the last pruning."""
+
+    __slots__ = ('keys', 'prune_at')
+
+    def __init__(self):
+        self.keys = {}
+        self.prune_at = 64
+
+    def add(self, keys, deadline):
+        for key in keys:
+            self.keys[key] = deadline
+        if len(self.keys) >= self.prune_at:
+            self.keys = dict(self._live_items())
+            self.prune_at = max(64, 2 * len(self.keys))
+
+    def _live_items(self):
+        now = time.monotonic()
+        return [(key, deadline) for key, deadline in self.keys.items() if deadline is None or deadline > now]
+
+    def live_keys(self):
+        return [key for key, _ in self._live_items()]
+
+
+class CompressingSerializer(BaseSerializer):
+    """Base class of binary serializers that compress payloads of at least
+    ``compress_threshold`` bytes with zlib. Payloads are prefixed with one
+    byte telling whether they are compressed.
+
+    :param compress_threshold:
+        The minimum size (in bytes) of compressed payloads, ``None`` to never compress.
+    :type compress_threshold: Optional[int]
+    """
+
+    DEFAULT_ENCODING = None
+
+    _raw = b'\x00'
+    _compressed = b'\x01'
+
+    def __init__(self, *args, compress_threshold=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compress_threshold = int(compress_threshold) if compress_threshold is not None else None
+
+    def encode(self, value):
+        raise NotImplementedError
+
+    def decode(self, data):
+        raise NotImplementedError
+
+    def dumps(self, value):
+        data = self.encode(value)
+        if self.compress_threshold is not None and len(data) >= self.compress_threshold:
+            return self._compressed + zlib.compress(data)
+        return self._raw + data
+
+    def loads(self, value):
+        if value is None:
+            return None
+        data = memoryview(value)[1:]
+        if value[:1] == self._compressed:
+            data = zlib.decompress(data)
+        return self.decode(data)
+
+
+class PickleSerializer(CompressingSerializer):
+    """Serializes values with pickle protocol 5 (4 on Python 3.7), so any
+    picklable value, including tuples, dicts with integer keys and model
+    instances, round-trips. Only use it with a cache no untrusted party
+    can write to.
+    """
+
+    protocol = min(5, pickle.HIGHEST_PROTOCOL)
+
+    def encode(self, value):
+        return pickle.dumps(value, protocol=self.protocol)
+
+    def decode(self, data):
+        return pickle.loads(data)
+
+
+class MsgPackSerializer(CompressingSerializer):
+    """Serializes values with `msgpack <https://msgpack.org>`__. Supports
+    the types JSON supports as well as bytes, tuples, sets and dicts with
+    integer keys.
+    """
+
+    _tuple = 1
+    _set = 2
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        try:
+            import msgpack
+        except ImportError:
+            raise ConfigurationError("CACHE_SERIALIZER=msgpack requires msgpack; "
+                                     "install versa-framework[msgpack]")
+        self._msgpack = msgpack
+
+    def _default(self, value):
+        if isinstance(value, tuple):
+            return self._msgpack.ExtType(self._tuple, self.encode(list(value)))
+        if isinstance(value, (set, frozenset)):
+            return self._msgpack.ExtType(self._set, self.encode(list(value)))
+        raise TypeError(f"Cannot serialize {type(value).__name__} with msgpack")
+
+    def _ext_hook(self, code, data):
+        if code == self._tuple:
+            return tuple(self.decode(data))
+        if code == self._set:
+            return set(self.decode(data))
+        return self._msgpack.ExtType(code, data)
+
+    def encode(self, value):
+        return self._msgpack.packb(value, use_bin_type=True, strict_types=True, default=self._default)
+
+    def decode(self, data):
+        return self._msgpack.unpackb(data, raw=False, strict_map_key=False, ext_hook=self._ext_hook)
+
+
+_serializers = {
+    'json': 'aiocache.serializers.JsonSerializer',
+    'pickle': 'versa.cache.PickleSerializer',
+    'msgpack': 'versa.cache.MsgPackSerializer',
+}
+
+
+def serializer_config():
+    """Returns the aiocache serializer configuration for ``CACHE_SERIALIZER``
+    and ``CACHE_COMPRESS_THRESHOLD``."""
+    name = os.getenv('CACHE_SERIALIZER', 'json')
+    try:
+        config = {'class': _serializers[name]}
+    except KeyError:
+        raise ConfigurationError(f"Unsupported CACHE_SERIALIZER: {name}")
+    if name != 'json' and os.getenv('CACHE_COMPRESS_THRESHOLD'):
+        config['compress_threshold'] = os.getenv('CACHE_COMPRESS_THRESHOLD')
+    return config
+
+
+def _create_serializer(config):
+    config = dict(config)
+    module_name, class_name = config.pop('class').rsplit('.', 1)
+    return getattr(__import__(module_name, fromlist=[class_name]), class_name)(**config)
+
+
+def approximate_size(value):
+    """The approximate size of a (usually serialized) value in bytes."""
+    if isinstance(value, (str, bytes, bytearray, memoryview)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """A bounded in-process mapping that evicts the least recently used
+    entries and entries older than their time to live.
+
+    :param int max_size:
+        The maximum number of entries.
+    :param ttl:
+        The default time to live of entries in seconds, ``None`` for no expiry.
+    :type ttl: Optional[float]
+    :param max_bytes:
+        The approximate maximum size of all values in bytes, ``None`` for no limit.
+    :type max_bytes: Optional[int]
+    :ivar int nbytes:
+        The approximate size of all values in bytes.
+    :ivar int evictions:
+        The number of entries evicted to stay within the limits.
+    :ivar int expirations:
+        The number of entries removed because they expired.
+    """
+
+    prune_interval = 60
+
+    def __init__(self, max_size=1024, ttl=None, max_bytes=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._pruned_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _missing) is not _missing
+
+    def _remove(self, key):
+        value, _, size = self._entries.pop(key)
+        self.nbytes -= size
+        return value
+
+    def get(self, key, default=None):
+        try:
+            value, expires_at, _ = self._entries[key]
+        except KeyError:
+            return default
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl if self.ttl is None else min(ttl, self.ttl)
+        now = time.monotonic()
+        if key in self._entries:
+            self._remove(key)
+        size = approximate_size(value)
+        self._entries[key] = (value, now + ttl if ttl is not None else None, size)
+        self.nbytes += size
+        if now - self._pruned_at >= self.prune_interval:
+            self.prune()
+        while len(self._entries) > self.max_size or (self.max_bytes is not None
+                                                     and self.nbytes > self.max_bytes and len(self._entries) > 1):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def expire(self, key, ttl):
+        """Sets the time to live of an entry, ``None`` to never expire.
+        Returns whether the entry exists."""
+        value = self.get(key, _missing)
+        if value is _missing:
+            return False
+        _, _, size = self._entries[key]
+        self._entries[key] = (value, time.monotonic() + ttl if ttl is not None else None, size)
+        return True
+
+    def prune(self):
+        """Removes all expired entries."""
+        now = self._pruned_at = time.monotonic()
+        expired = [key for key, (_, expires_at, _) in self._entries.items()
+                   if expires_at is not None and expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+
+    def delete(self, key):
+        if key not in self._entries:
+            return False
+        self._remove(key)
+        return True
+
+    def clear(self, prefix=None):
+        if prefix is None:
+            self._entries.clear()
+            self.nbytes = 0
+            return
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self._remove(key)
+
+    def keys(self):
+        return self._entries.keys()
 
-def cached(expire_after=None, key=None, include_self=True):
+
+class LocalInvalidationBus:
+    """Delivers cache invalidations to the subscribers of a channel within
+    this process. Stands in for Redis pub/sub in tests and single process
+    setups.
+    """
+
+    _subscribers = {}
+
+    def __init__(self):
+        self._subscriptions = []
+
+    def subscribe(self, channel, callback):
+        self._subscribers.setdefault(channel, []).append(callback)
+        self._subscriptions.append((channel, callback))
+
+    async def publish(self, channel, message):
+        for callback in tuple(self._subscribers.get(channel, ())):
+            callback(message)
+
+    async def close(self):
+        for channel, callback in self._subscriptions:
+            self._subscribers[channel].remove(callback)
+        self._subscriptions.clear()
+
+
+class RedisInvalidationBus:
+    """Delivers cache invalidations to all processes subscribed to a
+    channel using Redis pub/sub.
+
+    :param cache:
+        The :class:`aiocache.RedisCache` used to publish invalidations.
+    :param Callable on_reconnect:
+        Called after the subscription was reestablished, since
+        invalidations may have been missed.
+    """
+
+    reconnect_delay = 5
+
+    def __init__(self, cache, endpoint, port, password=None, db=0, on_reconnect=None):
+        self.cache = cache
+        self.endpoint = endpoint
+        self.port = int(port)
+        self.password = password or None
+        self.db = int(db or 0)
+        self.on_reconnect = on_reconnect
+        self._tasks = []
+
+    def subscribe(self, channel, callback):
+        self._tasks.append(asyncio.ensure_future(self._listen(channel, callback)))
+
+    async def publish(self, channel, message):
+        await self.cache.raw('publish', channel, message)
+
+    async def _listen(self, channel, callback):
+        import aioredis
+        connected_before = False
+        while True:
+            try:
+                if hasattr(aioredis, 'create_redis'):
+                    # aioredis 1.x
+                    redis = await aioredis.create_redis((self.endpoint, self.port),
+                                                        password=self.password, db=self.db)
+                    try:
+                        receiver, = await redis.subscribe(channel)
+                        if connected_before and self.on_reconnect is not None:
+                            self.on_reconnect()
+                        connected_before = True
+                        async for message in receiver.iter(encoding='utf-8'):
+                            callback(message)
+                    finally:
+                        redis.close()
+                else:
+                    redis = aioredis.Redis(host=self.endpoint, port=self.port, password=self.password,
+                                           db=self.db, decode_responses=True)
+                    pubsub = redis.pubsub()
+                    try:
+                        await pubsub.subscribe(channel)
+                        if connected_before and self.on_reconnect is not None:
+                            self.on_reconnect()
+                        connected_before = True
+                        async for message in pubsub.listen():
+                            if message['type'] == 'message':
+                                callback(message['data'])
+                    finally:
+                        await pubsub.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lost the cache invalidation subscription, reconnecting")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+
+class TieredCache(BaseCache):
+    """A cache backend with a bounded in-process :class:`LRUCache` (L1) in
+    front of a shared cache (L2), which is Redis or, with ``local=True``,
+    an in-memory stand-in.
+
+    Reads are only sent to L2 on an L1 miss. Writes and deletions go to L2
+    and are published on ``channel``, so the other processes sharing the
+    L2 (the same ``NAMESPACE``) drop the keys from their L1. Entries are
+    kept in L1 for at most ``l1_ttl`` seconds in case an invalidation is
+    missed.
+
+    L1 stores the values themselves instead of serialized copies, so
+    values read from the cache must not be mutated.
+
+    :param int l1_max_size:
+        The maximum number of entries in L1.
+    :param float l1_ttl:
+        The maximum time (in seconds) entries are kept in L1.
+    :param str channel:
+        The pub/sub channel invalidations are published on.
+    :param bool local:
+        Whether to use the in-memory stand-in instead of Redis.
+    :param dict l2_serializer:
+        The aiocache configuration of the serializer used for L2.
+    """
+
+    def __init__(self, l1_max_size=1024, l1_ttl=60, channel='versa_invalidate', local=False, l2_serializer=None,
+                 endpoint='127.0.0.1', port=6379, password=None, db=0, pool_min_size=1, pool_max_size=10,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.l1 = LRUCache(max_size=int(l1_max_size), ttl=float(l1_ttl))
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        serializer = _create_serializer(l2_serializer) if l2_serializer is not None else JsonSerializer()
+        if local:
+            # unlike SimpleMemoryCache, it serializes counters like any other value
+            self.l2 = BoundedMemoryCache(serializer=serializer)
+            self.bus = LocalInvalidationBus()
+        else:
+            if getattr(aiocache, 'RedisCache', None) is None:
+                raise ConfigurationError("CACHE_TYPE tiered requires aioredis; install versa-framework[redis]")
+            self.l2 = aiocache.RedisCache(endpoint=endpoint, port=int(port), password=password, db=int(db or 0),
+                                          pool_min_size=pool_min_size, pool_max_size=pool_max_size,
+                                          serializer=serializer)
+            self.bus = RedisInvalidationBus(self.l2, endpoint, port, password=password, db=db,
+                                            on_reconnect=self.l1.clear)
+        self._subscribed = False
+
+    def _subscribe(self):
+        if not self._subscribed:
+            self.bus.subscribe(self.channel, self._on_invalidation)
+            self._subscribed = True
+
+    def _on_invalidation(self, message):
+        try:
+            message = json.loads(message)
+        except ValueError:
+            return
+        if message.get('origin') == self.origin:
+            return
+        if message.get('clear'):
+            self.l1.clear()
+        for key in message.get('keys', ()):
+            self.l1.delete(key)
+
+    async def _invalidate(self, keys=(), clear=False):
+        for key in keys:
+            self.l1.delete(key)
+        message = {'origin': self.origin, 'keys': list(keys)}
+        if clear:
+            self.l1.clear()
+            message['clear'] = True
+        try:
+            await self.bus.publish(self.channel, json.dumps(message))
+        except Exception:
+            # the other processes' L1 entries expire after l1_ttl
+            logger.exception("Could not publish a cache invalidation")
+
+    async def _get(self, key, encoding='utf-8', **kwargs):
+        self._subscribe()
+        value = self.l1.get(key, _missing)
+        if value is not _missing:
+            return value
+        value = await self.l2.get(key)
+        if value is not None:
+            self.l1.set(key, value)
+        return value
+
+    async def _multi_get(self, keys, encoding='utf-8', **kwargs):
+        self._subscribe()
+        values = [self.l1.get(key, _missing) for key in keys]
+        missing = [key for key, value in zip(keys, values) if value is _missing]
+        if missing:
+            fetched = dict(zip(missing, await self.l2.multi_get(missing)))
+            for key, value in fetched.items():
+                if value is not None:
+                    self.l1.set(key, value)
+            values = [fetched[key] if value is _missing else value for key, value in zip(keys, values)]
+        return values
+
+    async def _set(self, key, value, ttl=None, _cas_token=None, **kwargs):
+        self._subscribe()
+        result = await self.l2.set(key, value, ttl=ttl)
+        await self._invalidate((key,))
+        self.l1.set(key, value, ttl=ttl)
+        return result
+
+    async def _multi_set(self, pairs, ttl=None, **kwargs):
+        self._subscribe()
+        result = await self.l2.multi_set(pairs, ttl=ttl)
+        await self._invalidate([key for key, _ in pairs])
+        for key, value in pairs:
+            self.l1.set(key, value, ttl=ttl)
+        return result
+
+    async def _add(self, key, value, ttl=None, **kwargs):
+        self._subscribe()
+        result = await self.l2.add(key, value, ttl=ttl)
+        await self._invalidate((key,))
+        self.l1.set(key, value, ttl=ttl)
+        return result
+
+    async def _exists(self, key, **kwargs):
+        self._subscribe()
+        return key in self.l1 or await self.l2.exists(key)
+
+    async def _increment(self, key, delta, **kwargs):
+        self._subscribe()
+        result = await self.l2.increment(key, delta)
+        if delta:
+            await self._invalidate((key,))
+        return result
+
+    async def _expire(self, key, ttl, **kwargs):
+        self._subscribe()
+        result = await self.l2.expire(key, ttl)
+        await self._invalidate((key,))
+        return result
+
+    async def _delete(self, key, **kwargs):
+        self._subscribe()
+        result = await self.l2.delete(key)
+        await self._invalidate((key,))
+        return result
+
+    async def _clear(self, namespace=None, **kwargs):
+        self._subscribe()
+        result = await self.l2.clear(namespace=namespace)
+        await self._invalidate(clear=True)
+        return result
+
+    async def _raw(self, command, *args, encoding='utf-8', _conn=None, **kwargs):
+        return await self.l2.raw(command, *args, **kwargs)
+
+    async def _redlock_release(self, key, value):
+        result = await self.l2._redlock_release(key, value)
+        await self._invalidate((key,))
+        return result
+
+    async def _close(self, **kwargs):
+        await self.bus.close()
+        self._subscribed = False
+        await self.l2.close()
+
+
+class BoundedMemoryCache(BaseCache):
+    """An in-process cache backend that keeps at most ``max_size`` entries
+    and approximately ``max_bytes`` bytes of serialized values, evicting the
+    least recently used entries and expired ones. Each namespace has its
+    own limits; :attr:`stats` shows how much of them is used.
+
+    :param int max_size:
+        The maximum number of entries.
+    :param max_bytes:
+        The approximate maximum size of all values in bytes, ``None`` for no limit.
+    :type max_bytes: Optional[int]
+    """
+
+    def __init__(self, max_size=100000, max_bytes=None, **kwargs):
+        super().__init__(**kwargs)
+        self._entries = LRUCache(max_size=int(max_size),
+                                 max_bytes=int(max_bytes) if max_bytes is not None else None)
+
+    @property
+    def stats(self):
+        entries = self._entries
+        return {
+            'entries': len(entries),
+            'bytes': entries.nbytes,
+            'max_entries': entries.max_size,
+            'max_bytes': entries.max_bytes,
+            'evictions': entries.evictions,
+            'expirations': entries.expirations,
+        }
+
+    async def _get(self, key, encoding='utf-8', **kwargs):
+        return self._entries.get(key)
+
+    async def _multi_get(self, keys, encoding='utf-8', **kwargs):
+        return [self._entries.get(key) for key in keys]
+
+    async def _set(self, key, value, ttl=None, _cas_token=None, **kwargs):
+        if _cas_token is not None and _cas_token != self._entries.get(key):
+            return 0
+        self._entries.set(key, value, ttl=ttl or None)
+        return True
+
+    async def _multi_set(self, pairs, ttl=None, **kwargs):
+        for key, value in pairs:
+            self._entries.set(key, value, ttl=ttl or None)
+        return True
+
+    async def _add(self, key, value, ttl=None, **kwargs):
+        if key in self._entries:
+            raise ValueError(f"Key {key} already exists, use .set to update the value")
+        self._entries.set(key, value, ttl=ttl or None)
+        return True
+
+    async def _exists(self, key, **kwargs):
+        return key in self._entries
+
+    async def _increment(self, key, delta, **kwargs):
+        value = self._entries.get(key)
+        if value is None:
+            value = delta
+        else:
+            try:
+                value = int(self.serializer.loads(value)) + delta
+            except (TypeError, ValueError):
+                raise TypeError("Value is not an integer") from None
+        # stored like _set stores values so get can read counters
+        self._entries.set(key, self.serializer.dumps(value))
+        return value
+
+    async def _expire(self, key, ttl, **kwargs):
+        return self._entries.expire(key, ttl or None)
+
+    async def _delete(self, key, **kwargs):
+        return int(self._entries.delete(key))
+
+    async def _clear(self, namespace=None, **kwargs):
+        self._entries.clear(prefix=namespace)
+        return True
+
+    async def _raw(self, command, *args, encoding='utf-8', _conn=None, **kwargs):
+        return getattr(self._entries, command)(*args, **kwargs)
+
+    async def _redlock_release(self, key, value):
+        if self._entries.get(key) == value:
+            self._entries.delete(key)
+            return 1
+        return 0
+
+    async def _close(self, **kwargs):
+        pass
+
+
+def cached(expire_after=None, key=None, include_self=True, stale_while_revalidate=0, early_refresh=1.0):
     """Creates a decorator that caches the return value of the
     decorated function or method.
 
@@ -72,6 +862,14 @@ def cached(expire_after=None, key=None, include_self=True):
     arguments passed to the function are equal to a set of
     parameters that have been passed to the function before.
 
+    Concurrent calls that miss the cache with the same arguments
+    are computed only once per process. Shortly before a value
+    expires, a call may refresh it early in the background, the
+    more likely the closer the value is to expiring and the longer
+    it took to compute. Within ``stale_while_revalidate`` seconds
+    after it expired, the old value is returned while a single
+    background task computes the new one.
+
     :param expire_after:
         When to discard the cached return value after it has
         been cached. In seconds The default is ``None``, which means
@@ -88,6 +886,14 @@ def cached(expire_after=None, key=None, include_self=True):
         function are equal to ones that were passed to the
         function before.
     :type include_self: Optional[bool]
+    :param stale_while_revalidate:
+        For how long (in seconds) after expiring the old value
+        is returned while the new one is computed.
+    :type stale_while_revalidate: Optional[int]
+    :param early_refresh:
+        How eagerly values are refreshed before they expire;
+        ``0`` disables early refreshes.
+    :type early_refresh: Optional[float]
 
     Example: ::
 
@@ -98,7 +904,70 @@ def cached(expire_after=None, key=None, include_self=True):
             return 1 + 1
     """
     # TODO check parameter for custom validity/integrity checks
-    return aiocache.cached(key=key, ttl=expire_after, alias='default', noself=not include_self)
+    def decorator(func):
+        # cache key -> future of the running computation
+        in_flight = {}
+
+        def build_key(args, kwargs):
+            if key is not None:
+                return key
+            if not include_self:
+                args = args[1:]
+            return f'{func.__module__ or ""}{func.__name__}{args}{kwargs}'
+
+        async def compute(cache_key, args, kwargs):
+            started_at = time.monotonic()
+            value = await maybe_coroutine(func, *args, **kwargs)
+            # stored along with when and how quickly it was computed for early refreshes
+            entry = [value, time.time(), time.monotonic() - started_at]
+            ttl = None if expire_after is None else expire_after + stale_while_revalidate
+            try:
+                await get_cache().set(cache_key, entry, ttl=ttl)
+            except Exception:
+                logger.exception("Could not cache the return value of %s", func.__qualname__)
+            return value
+
+        def computation(cache_key, args, kwargs):
+            future = in_flight.get(cache_key)
+            if future is None:
+                future = in_flight[cache_key] = asyncio.ensure_future(compute(cache_key, args, kwargs))
+
+                def done(_future):
+                    if in_flight.get(cache_key) is _future:
+                        del in_flight[cache_key]
+                    if not _future.cancelled() and _future.exception() is not None:
+                        logger.debug("Computing %s failed", func.__qualname__, exc_info=_future.exception())
+
+                future.add_done_callback(done)
+            return future
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_key = build_key(args, kwargs)
+            try:
+                entry = await get_cache().get(cache_key)
+            except Exception:
+                entry = None
+            if not isinstance(entry, (list, tuple)) or len(entry) != 3:
+                # missing or cached by an older version
+                entry = None
+            if entry is not None and expire_after is not None:
+                value, computed_at, duration = entry
+                age = time.time() - computed_at
+                if age >= expire_after + stale_while_revalidate:
+                    entry = None
+                elif age >= expire_after:
+                    computation(cache_key, args, kwargs)
+                elif early_refresh and age - duration * early_refresh * math.log(1.0 - random.random()) >= expire_after:
+                    computation(cache_key, args, kwargs)
+            if entry is None:
+                # the computation must not be cancelled along with one of its waiters
+                return await asyncio.shield(computation(cache_key, args, kwargs))
+            return entry[0]
+
+        return wrapper
+
+    return decorator
 
 
 def init():
@@ -106,11 +975,11 @@ def init():
     if cache_type == 'simple':
         _cache_config = {
             'default': {
-                'cache': 'aiocache.SimpleMemoryCache',
+                'cache': 'versa.cache.BoundedMemoryCache',
                 'namespace': 'versa',
-                'serializer': {
-                    'class': 'aiocache.serializers.JsonSerializer'
-                }
+                'max_size': os.getenv('CACHE_MAX_ENTRIES', 100000),
+                'max_bytes': os.getenv('CACHE_MAX_BYTES', 64 * 1024 * 1024),
+                'serializer': serializer_config()
             }
         }
     elif cache_type == 'redis':
@@ -124,11 +993,32 @@ def init():
                 'namespace': 'versa_' + os.getenv('NAMESPACE'),
                 'pool_min_size': 1,
                 'pool_max_size': 10,
+                'serializer': serializer_config()
+            }
+        }
+    elif cache_type in ('tiered', 'tiered_local'):
+        _cache_config = {
+            'default': {
+                'cache': 'versa.cache.TieredCache',
+                'namespace': 'versa_' + os.getenv('NAMESPACE'),
+                'channel': 'versa_invalidate_' + os.getenv('NAMESPACE'),
+                'local': cache_type == 'tiered_local',
+                'l1_max_size': os.getenv('CACHE_L1_SIZE', 1024),
+                'l1_ttl': os.getenv('CACHE_L1_TTL', 60),
+                'l2_serializer': serializer_config(),
                 'serializer': {
-                    'class': 'aiocache.serializers.JsonSerializer'
+                    # L1 keeps the values themselves, L2 serializes them
+                    'class': 'aiocache.serializers.NullSerializer'
                 }
             }
         }
+        if cache_type == 'tiered':
+            _cache_config['default'].update({
+                'endpoint': os.getenv('CACHE_HOST'),
+                'port': os.getenv('CACHE_PORT'),
+                'password': os.getenv('CACHE_PASSWORD'),
+                'db': os.getenv('CACHE_DB'),
+            })
     else:
         raise ConfigurationError("The configuration uses an unsupported cache backend: "
                                  "{}".format(os.getenv('CACHE_TYPE')))
@@ -14,12 +14,12 @@ from versa import logging, utils
 
 
 class Cog(_discord_cog.Cog):
-    def __init__(self, core, extension: versa.Extension):
+    def __init__(self, core, extension: "versa.Extension"):
         self.core = core
         self.extension = extension
         self.ctl = core.get_controller(self.extension.name)
         self.db = versa.Database(self.core)
-        self.cache = versa.get_cache(self.extension.name)
+        self.cache = versa.Cache(self.extension.name, core=self.core)
         self.settings = core.get_settings(self.extension.name)
 
         self.log = logging.Logger.with_default_handlers(name=f"versa.extensions.{self.qualified_name}",
@@ -43,7 +43,37 @@ def command(name=None, cls=None, **attrs):
     return decorator
 
 
+def command_path(command, name=None):
+    """The tokens ``command`` is invoked with under ``name`` (its name or one
+    of its aliases, by default its name): the path of its parent group
+    followed by the name without the group's name as prefix, e.g.
+    ``('settings', 'prefix')`` for ``settings_prefix`` in the group ``settings``."""
+    if name is None:
+        name = command.name
+    parent = command.parent
+    if parent is None:
+        return (name,)
+    prefix = parent.name + '_'
+    if name.startswith(prefix):
+        name = name[len(prefix):]
+    return command_path(parent) + (name,)
+
+
 class Group(_Group):
+    @property
+    def path(self):
+        # not cached, commands are only grouped after they have been added
+        return command_path(self)
+
+    def _find_subcommand(self, ctx, trigger):
+        dispatch_table = getattr(ctx.bot, 'dispatch_table', None)
+        if dispatch_table is not None:
+            command = dispatch_table.get(self.path + (trigger,))
+            if command is not None:
+                return command
+        # subcommands added to the group itself (e.g. with @group.command()) aren't in the dispatch table
+        return self.all_commands.get('_'.join((self.qualified_name, trigger))) or self.all_commands.get(trigger)
+
     async def invoke(self, ctx):
         ctx.invoked_subcommand = None
         early_invoke = not self.invoke_without_command
@@ -57,7 +87,7 @@ class Group(_Group):
 
         if trigger:
             ctx.subcommand_passed = trigger
-            ctx.invoked_subcommand = self.all_commands.get('_'.join((self.qualified_name, trigger)), None)
+            ctx.invoked_subcommand = self._find_subcommand(ctx, trigger)
 
         if early_invoke:
             injected = hooked_wrapped_callback(self, ctx, self.callback)
@@ -89,7 +119,7 @@ class Group(_Group):
 
         if trigger:
             ctx.subcommand_passed = trigger
-            ctx.invoked_subcommand = self.all_commands.get('_'.join((self.qualified_name, trigger)), None)
+            ctx.invoked_subcommand = self._find_subcommand(ctx, trigger)
 
         if early_invoke:
             try:
@@ -54,7 +54,7 @@ class Extension:
 
     def get_controller(self, core):
         db = versa.Database(core)
-        cache = versa.get_cache(self.name)
+        cache = versa.Cache(self.name, core=core)
         settings = core.get_settings(self.name)
         _ControllerClass = self._controller_cls
         if _ControllerClass is None:
@@ -207,13 +207,28 @@ class Config:
             'DB_PASSWORD': os.getenv('DB_PASSWORD', None),
             'DB_HOST': os.getenv('DB_HOST', None),
             'DB_PORT': os.getenv('DB_PORT', None),
+            'DB_THREADS': os.getenv('DB_THREADS', None),
+            'DB_SERIALIZE_WRITES': os.getenv('DB_SERIALIZE_WRITES', None),
+            'DB_ASYNC_DRIVER': os.getenv('DB_ASYNC_DRIVER', None),
+            'DB_ASYNC_ALIAS': os.getenv('DB_ASYNC_ALIAS', None),
             'CACHE_TYPE': os.getenv('CACHE_TYPE', 'simple'),
             'CACHE_HOST': os.getenv('CACHE_HOST', None),
             'CACHE_PORT': os.getenv('CACHE_PORT', None),
             'CACHE_PASSWORD': os.getenv('CACHE_PASSWORD', None),
             'CACHE_DB': os.getenv('CACHE_DB', 0),
+            'CACHE_MAX_ENTRIES': os.getenv('CACHE_MAX_ENTRIES', None),
+            'CACHE_MAX_BYTES': os.getenv('CACHE_MAX_BYTES', None),
+            'CACHE_L1_SIZE': os.getenv('CACHE_L1_SIZE', None),
+            'CACHE_L1_TTL': os.getenv('CACHE_L1_TTL', None),
+            'CACHE_SERIALIZER': os.getenv('CACHE_SERIALIZER', None),
+            'CACHE_COMPRESS_THRESHOLD': os.getenv('CACHE_COMPRESS_THRESHOLD', None),
+            'MODEL_CACHE': os.getenv('MODEL_CACHE', None),
+            'MODEL_CACHE_TTL': os.getenv('MODEL_CACHE_TTL', None),
             'USE_MEMBERS_INTENT': os.getenv('USE_MEMBERS_INTENT', False),
-            'USE_PRESENCE_INTENT': os.getenv('USE_PRESENCE_INTENT', False)
+            'USE_PRESENCE_INTENT': os.getenv('USE_PRESENCE_INTENT', False),
+            'BULK_GUILD_SYNC': os.getenv('BULK_GUILD_SYNC', None),
+            'GUILD_SYNC_INTERVAL': os.getenv('GUILD_SYNC_INTERVAL', None),
+            'GUILD_SYNC_PRUNE': os.getenv('GUILD_SYNC_PRUNE', None)
         }
         _config = {key: value for key, value in _config.items() if value is not None}
         return _config
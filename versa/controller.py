@@ -12,7 +12,7 @@ from versa import logging
 
 
 class Controller:
-    def __init__(self, core: versa.Core, extension: versa.Extension, db: versa.Database, cache, settings):
+    def __init__(self, core: "versa.Core", extension: "versa.Extension", db: "versa.Database", cache, settings):
         self.core = core
         self.extension = extension
         self.db = db
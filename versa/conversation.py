@@ -0,0 +1,199 @@
+"""versa-framework: A framework to make discord bots
+
+:copyright: (c) 2022 devcbezerra.
+:license: Apache-2.0 OR MIT
+"""
+
+import discord
+
+from .cache import Cache
+from .errors import ConversationAlreadyRunning
+
+
+class Conversation:
+    """A multi-step prompt whose state is kept in the ``conversations``
+    namespace of the versa cache between steps, so it survives restarts
+    and can be continued by any process running the bot.
+
+    Subclasses are registered by :attr:`name` when they are defined; each
+    process that should be able to continue a conversation has to import
+    its class. :meth:`start` sends the first prompt and returns the name
+    of the first step. The step named ``foo`` is handled by the coroutine
+    method ``on_foo``, which receives the author's next message in the
+    channel (or, after :meth:`expect_reaction`, the next
+    :class:`discord.RawReactionActionEvent` on that message) and returns
+    the name of the next step or ``None`` to end the conversation.
+    Returning the current step waits for another event of the same kind,
+    e.g. after an invalid answer; :meth:`expect_message` switches back to
+    waiting for messages. If a step raises, the conversation keeps waiting
+    for the step.
+
+    Everything that has to outlive a step belongs in :attr:`data`, which
+    needs to be serializable by ``CACHE_SERIALIZER``. Conversations that
+    aren't continued within :attr:`ttl` seconds are dropped.
+
+    :ivar core:
+        The core.
+    :ivar int channel_id:
+        The ID of the channel the conversation takes place in.
+    :ivar int user_id:
+        The ID of the user the conversation is with.
+    :ivar dict data:
+        The conversation's state.
+    """
+
+    name = None
+    """The name the conversation is stored under; defaults to the
+    class' qualified name. Subclasses don't inherit it."""
+    ttl = 300
+    """How long (in seconds) the conversation waits for the next event."""
+
+    _registry = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'name' not in cls.__dict__ or cls.name is None:
+            cls.name = f'{cls.__module__}.{cls.__qualname__}'
+        registered = cls._registry.get(cls.name)
+        # the same class is registered again when its extension is reloaded
+        if registered is not None and (registered.__module__, registered.__qualname__) \
+                != (cls.__module__, cls.__qualname__):
+            raise ValueError(f"A conversation named {cls.name!r} already exists: {registered.__qualname__}")
+        cls._registry[cls.name] = cls
+
+    def __init__(self, core, channel_id, user_id, data=None):
+        self.core = core
+        self.channel_id = channel_id
+        self.user_id = user_id
+        self.data = data if data is not None else {}
+        self.message_id = None
+
+    async def start(self):
+        """Sends the first prompt and returns the name of the first step."""
+        raise NotImplementedError
+
+    def expect_reaction(self, message):
+        """Makes the next steps wait for a reaction of the user on ``message``
+        instead of a message."""
+        self.message_id = getattr(message, 'id', message)
+
+    def expect_message(self):
+        """Makes the next steps wait for a message of the user again."""
+        self.message_id = None
+
+    async def get_channel(self):
+        channel = self.core.get_channel(self.channel_id)
+        if channel is None:
+            channel = await self.core.fetch_channel(self.channel_id)
+        return channel
+
+    async def send(self, *args, **kwargs):
+        """Sends a message to the conversation's channel."""
+        channel = await self.get_channel()
+        return await channel.send(*args, **kwargs)
+
+    async def handle(self, step, event):
+        return await getattr(self, f'on_{step}')(event)
+
+
+class ConversationManager:
+    """Starts :class:`Conversation` s and continues them when the events
+    they wait for are dispatched.
+
+    A conversation's state is deleted from the cache before a step is
+    handled, so only the process whose deletion succeeds handles it; it's
+    stored again if the step raises.
+
+    :param core:
+        The core.
+    """
+
+    def __init__(self, core):
+        self.core = core
+        self.cache = Cache('conversations', core=core)
+
+    @staticmethod
+    def message_key(channel_id, user_id):
+        return f'message:{channel_id}:{user_id}'
+
+    @staticmethod
+    def reaction_key(message_id, user_id):
+        return f'reaction:{message_id}:{user_id}'
+
+    async def start(self, conversation_cls, ctx_or_message, responding=None, data=None):
+        """Starts a conversation.
+
+        :param conversation_cls:
+            A subclass of :class:`Conversation`.
+        :param ctx_or_message:
+            The :class:`~discord.ext.commands.Context` or
+            :class:`discord.Message` the conversation starts from.
+        :param responding:
+            The user the conversation is with; defaults to the message's author.
+        :param dict data:
+            The initial :attr:`Conversation.data`.
+        :raises ConversationAlreadyRunning:
+            If the user already has a conversation waiting for the same
+            messages or reactions.
+        """
+        message = getattr(ctx_or_message, 'message', ctx_or_message)
+        if not isinstance(message, discord.Message):
+            raise TypeError("ctx_or_message needs to be either a Context or a Message object")
+        if responding is None:
+            responding = message.author
+        key = self.message_key(message.channel.id, responding.id)
+        if await self.cache.exists(key):
+            raise ConversationAlreadyRunning(f"{responding} already has a conversation in this channel", key=key)
+        conversation = conversation_cls(self.core, message.channel.id, responding.id, data=data)
+        await self._advance(conversation, await conversation.start(), replace=False)
+        return conversation
+
+    def _key(self, conversation):
+        if conversation.message_id is not None:
+            return self.reaction_key(conversation.message_id, conversation.user_id)
+        return self.message_key(conversation.channel_id, conversation.user_id)
+
+    async def _advance(self, conversation, step, replace=True):
+        if step is None:
+            return
+        key = self._key(conversation)
+        state = {
+            'conversation': conversation.name,
+            'step': step,
+            'channel_id': conversation.channel_id,
+            'user_id': conversation.user_id,
+            'message_id': conversation.message_id,
+            'data': conversation.data,
+        }
+        if replace:
+            await self.cache.set(key, state, ttl=conversation.ttl)
+            return
+        try:
+            await self.cache.add(key, state, ttl=conversation.ttl)
+        except ValueError:
+            raise ConversationAlreadyRunning(f"A conversation is already waiting for {key}", key=key) from None
+
+    async def _continue(self, key, event):
+        state = await self.cache.get(key)
+        if state is None or not await self.cache.delete(key):
+            return
+        conversation_cls = Conversation._registry.get(state['conversation'])
+        if conversation_cls is None:
+            return
+        conversation = conversation_cls(self.core, state['channel_id'], state['user_id'], data=state['data'])
+        conversation.message_id = state.get('message_id')
+        try:
+            step = await conversation.handle(state['step'], event)
+        except Exception:
+            # keep waiting for the step instead of losing the conversation
+            await self.cache.set(key, state, ttl=conversation.ttl)
+            raise
+        await self._advance(conversation, step)
+
+    async def dispatch_message(self, message):
+        if Conversation._registry and not message.author.bot:
+            await self._continue(self.message_key(message.channel.id, message.author.id), message)
+
+    async def dispatch_reaction(self, payload):
+        if Conversation._registry and payload.user_id != self.core.user.id:
+            await self._continue(self.reaction_key(payload.message_id, payload.user_id), payload)
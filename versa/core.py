@@ -14,23 +14,26 @@ import sys
 import traceback
 import types
 import warnings
+from collections import Counter
 
 import aiohttp
 import discord
 import versa
 from discord.ext import commands
-from discord.ext.commands import when_mentioned_or
 from django.core import management
 
 from . import strings
 from .cache import get_cache
 from .cli import style
-from .command import group
+from .command import command_path, group
 from .conf import Extension, Extensions
+from .conversation import ConversationManager
 from .db import Database
 from .errors import (InactiveUser, ObjectDoesNotExist, ResponseTookTooLong,
                      UserDoesNotExist)
-from .utils import MockMember, issubmodule, titlecaseify
+from .utils import (CoalescingCache, MockMember, close_db_executor,
+                    issubmodule, titlecaseify)
+from .waiters import WaiterRegistry
 
 
 class CommandConflict(discord.ClientException):
@@ -42,6 +45,7 @@ class Core(commands.Bot):
 
     YES_EMOJI = '\u2705'
     NO_EMOJI = '\u274E'
+    REST_CACHE_TTL = 60
 
     def __init__(self, config, settings, name='default', loop=None):
         self.name = name
@@ -53,6 +57,21 @@ class Core(commands.Bot):
         self.cache.core = self
         self.db = Database(self)
         self.config = config
+        self._guild_sync_lock = None
+        self._guilds_synced = False
+        self.message_counters = Counter()
+        """How many messages were rejected by :meth:`on_message` at each
+        stage (``not_ready``, ``bot_author``, ``empty``, ``no_prefix``) and
+        how many were ``accepted`` for command processing."""
+        self.dispatch_table = {}
+        """Maps the tokens commands are invoked with (e.g. ``('settings', 'prefix')``)
+        to the commands."""
+        self.message_waiters = WaiterRegistry()
+        """Waiters for messages, keyed by ``(channel_id, author_id)``."""
+        self.reaction_waiters = WaiterRegistry()
+        """Waiters for added reactions, keyed by the message ID."""
+        self.conversations = ConversationManager(self)
+        self._rest_guilds = CoalescingCache(self.fetch_guild, ttl=self.REST_CACHE_TTL)
 
         self.sync_db('versa', interactive=versa.TEST)
 
@@ -62,6 +81,12 @@ class Core(commands.Bot):
             extension_names.remove('')
         self.sync_db(*extension_names, interactive=versa.TEST)
 
+        from versa.models import Guild, User
+        User.index.load(User.objects.values_list('id', 'is_active').iterator())
+        self.prefix_table = Guild.prefix_table
+        self.prefix_table.load(Guild.objects.exclude(prefix=None).exclude(prefix='')
+                               .values_list('id', 'prefix').iterator())
+
         intents = discord.Intents.default()
         if os.getenv('USE_MEMBERS_INTENT'):
             intents.members = True
@@ -73,8 +98,9 @@ class Core(commands.Bot):
         if self.settings is None:
             from versa.models import CoreSettings
             self.settings = CoreSettings.get_or_create(name=os.getenv('NAMESPACE'))
+        self.prefix_table.default = self.get_prefixes()
 
-        super(Core, self).__init__(command_prefix=when_mentioned_or(*self.get_prefixes()),
+        super(Core, self).__init__(command_prefix=self._command_prefix,
                                    loop=loop, description=self.get_description(),
                                    pm_help=None, cache_auth=False,
                                    command_not_found=strings.command_not_found,
@@ -122,6 +148,12 @@ class Core(commands.Bot):
         if not existed_already:
             await User.async_create(id=self.user.id)
 
+        if os.getenv('BULK_GUILD_SYNC'):
+            # events missed while reconnecting may have left rows out, but
+            # stale rows are only pruned once, from the state of the first ready
+            self.loop.create_task(self.sync_guilds(prune=not self._guilds_synced))
+            self._guilds_synced = True
+
         status = self.settings.status or f"Use {self.default_prefix}help"
         activity = discord.Game(status)
         await self.change_presence(status=discord.Status.online, activity=activity)
@@ -143,6 +175,45 @@ class Core(commands.Bot):
         print(self.get_oauth_url(), "\n")
         print(strings.official_server.format(strings.invite_link), "\n")
 
+    async def on_guild_join(self, guild):
+        if os.getenv('BULK_GUILD_SYNC'):
+            await self.sync_guilds((guild,), prune=True)
+
+    async def sync_guilds(self, guilds=None, prune=False):
+        """Synchronizes the database rows of the channels, roles and
+        emojis of ``guilds`` (all guilds by default) with their gateway
+        state in bulk.
+
+        Rows of channels and roles that no longer exist are only deleted if
+        ``prune`` is true, ``GUILD_SYNC_PRUNE`` is set and the guild is fully
+        chunked, since the deletion cascades to the rows referencing them.
+
+        Guilds are synchronized one at a time, with a pause of
+        ``GUILD_SYNC_INTERVAL`` seconds (default 0.5) between them, so
+        that the synchronization never occupies more than one database
+        thread and leaves room for regular queries.
+        """
+        from versa.models import Guild
+
+        if guilds is None:
+            guilds = self.guilds
+        interval = float(os.getenv('GUILD_SYNC_INTERVAL', 0.5))
+        prune = prune and bool(os.getenv('GUILD_SYNC_PRUNE'))
+        if self._guild_sync_lock is None:
+            self._guild_sync_lock = asyncio.Lock()
+        for guild in list(guilds):
+            if guild.unavailable:
+                continue
+            async with self._guild_sync_lock:
+                await Guild.async_sync_gateway_state(guild, prune=prune and guild.chunked)
+                await asyncio.sleep(interval)
+
+    async def close(self):
+        await super().close()
+        from versa import aiodb
+        await aiodb.close()
+        close_db_executor()
+
     def clear(self):
         self.recursively_remove_all_commands()
         self.extra_events.clear()
@@ -160,6 +231,36 @@ class Core(commands.Bot):
         super().add_cog(cog)
 
         self._resolve_groups(cog)
+        # the cog's commands have been moved into their groups
+        for command in cog.walk_commands():
+            self._add_paths(command)
+
+    def add_command(self, command):
+        super().add_command(command)
+        self._add_paths(command)
+
+    def _add_paths(self, command):
+        for name in (command.name, *command.aliases):
+            self.dispatch_table[command_path(command, name)] = command
+
+    def remove_command(self, name):
+        command = super().remove_command(name)
+        if command is not None:
+            # removing an alias leaves the command's other names
+            names = (command.name, *command.aliases) if name == command.name else (name,)
+            for _name in names:
+                # the command may have been added before it was grouped
+                for path in {command_path(command, _name), (_name,)}:
+                    if self.dispatch_table.get(path) is command:
+                        del self.dispatch_table[path]
+        return command
+
+    def compile_dispatch_table(self):
+        """Rebuilds :attr:`dispatch_table` from all commands. It's kept up to
+        date as commands are added and removed, e.g. by loading and
+        unloading extensions."""
+        self.dispatch_table = {command_path(command, name): command for command in set(self.walk_commands())
+                               for name in (command.name, *command.aliases)}
 
     def _resolve_groups(self, cog_or_command):
         if isinstance(cog_or_command, versa.Cog):
@@ -364,6 +465,19 @@ class Core(commands.Bot):
     def get_prefixes(self):
         return self.settings.prefixes
 
+    def _command_prefix(self, bot, message):
+        # resolved from the in-memory prefix table, never from the database
+        guild = message.guild
+        prefixes = commands.when_mentioned(bot, message)
+        prefix = self.prefix_table.match(message.content, guild.id if guild is not None else None)
+        if prefix is not None:
+            prefixes.append(prefix)
+        return prefixes
+
+    def get_guild_prefixes(self, guild_id):
+        """Returns the prefixes of the guild with the ID ``guild_id``."""
+        return self.prefix_table.get(guild_id)
+
     async def set_prefixes(self, prefixes):
         old_prefixes = self.settings.prefixes
         self.settings.prefixes = prefixes
@@ -375,7 +489,7 @@ class Core(commands.Bot):
         # test
         from versa.models import CoreSettings
         _settings = await CoreSettings.async_get(name=self.settings.name)
-        self.command_prefix = when_mentioned_or(*prefixes)
+        self.prefix_table.default = prefixes
 
     @property
     def default_prefix(self):
@@ -420,6 +534,8 @@ class Core(commands.Bot):
                 del self.__extensions[extension]
                 failed.append(extension)
 
+        self.compile_dispatch_table()
+
         if failed:
             print("\nFailed to load: " + ", ".join(failed))
 
@@ -457,12 +573,58 @@ class Core(commands.Bot):
             if not interactive:
                 sys.stdout = backup_stdout
 
+    def _may_have_prefix(self, message):
+        content = message.content
+        if content.startswith('<@'):
+            user_id = self.user.id
+            if content.startswith((f'<@{user_id}> ', f'<@!{user_id}> ')):
+                return True
+        guild = message.guild
+        return self.prefix_table.match(content, guild.id if guild is not None else None) is not None
+
     async def on_message(self, message):
+        # reject ordinary chat before a Context is built
+        counters = self.message_counters
         if not self.is_ready():
+            counters['not_ready'] += 1
+            return
+        if message.author.bot:
+            counters['bot_author'] += 1
+            return
+        if not message.content:
+            counters['empty'] += 1
             return
+        # only possible if the prefixes are resolved by the Core
+        if self.command_prefix == self._command_prefix and not self._may_have_prefix(message):
+            counters['no_prefix'] += 1
+            return
+        counters['accepted'] += 1
 
         await super().on_message(message)
 
+    @property
+    def open_waiters(self):
+        """The number of pending :meth:`wait_for_response`,
+        :meth:`wait_for_confirmation` and :meth:`wait_for_choice` calls."""
+        return len(self.message_waiters) + len(self.reaction_waiters)
+
+    def dispatch(self, event_name, *args, **kwargs):
+        if event_name == 'message':
+            message = args[0]
+            self.message_waiters.dispatch((message.channel.id, message.author.id), message)
+            self._schedule_event(self.conversations.dispatch_message, 'on_message', message)
+        elif event_name == 'raw_reaction_add':
+            payload = args[0]
+            self.reaction_waiters.dispatch(payload.message_id, payload)
+            self._schedule_event(self.conversations.dispatch_reaction, 'on_raw_reaction_add', payload)
+        super().dispatch(event_name, *args, **kwargs)
+
+    async def start_conversation(self, conversation_cls, ctx_or_message, responding=None, data=None):
+        """Starts a :class:`~versa.conversation.Conversation`. Unlike the
+        ``wait_for_*`` methods, it's continued after a restart and by any
+        process running the bot."""
+        return await self.conversations.start(conversation_cls, ctx_or_message, responding=responding, data=data)
+
     async def wait_for_response(self, ctx_or_message, responding=None, message_check=None, timeout=60, force_response=True) -> str:
         from versa import models
         if isinstance(ctx_or_message, versa.Context):
@@ -477,12 +639,10 @@ class Core(commands.Bot):
         if responding is None:
             responding = message.author
 
-        def response_check(_message):
-            is_response = responding.id == _message.author.id and message.channel == _message.channel
-            return is_response and (message_check(_message) if callable(message_check) else True)
-
         try:
-            response = await self.wait_for('message', check=response_check, timeout=timeout)
+            response = await self.message_waiters.wait((message.channel.id, responding.id),
+                                                        check=message_check if callable(message_check) else None,
+                                                        timeout=timeout)
         except asyncio.TimeoutError:
             if force_response:
                 raise ResponseTookTooLong()
@@ -503,18 +663,12 @@ class Core(commands.Bot):
 
         if use_reactions:
             def reaction_check(payload: discord.RawReactionActionEvent):
-                user_id = payload.user_id
-                message_id = payload.message_id
-                emoji = payload.emoji
-
-                return (message_id == message.id
-                        and user_id == responding.id
-                        and str(emoji) in (self.YES_EMOJI, self.NO_EMOJI))
+                return payload.user_id == responding.id and str(payload.emoji) in (self.YES_EMOJI, self.NO_EMOJI)
 
             await message.add_reaction(self.YES_EMOJI)
             await message.add_reaction(self.NO_EMOJI)
             try:
-                payload = await self.wait_for('raw_reaction_add', check=reaction_check, timeout=60)
+                payload = await self.reaction_waiters.wait(message.id, check=reaction_check, timeout=60)
             except asyncio.TimeoutError:
                 if force_response:
                     raise ResponseTookTooLong()
@@ -675,7 +829,7 @@ class Core(commands.Bot):
 
         await super().on_error(event_method, *args, **kwargs)
 
-    async def on_command_error(self, ctx: versa.Context, error):
+    async def on_command_error(self, ctx: "versa.Context", error):
         # get the original exception
         error = getattr(error, 'original', error)
 
@@ -853,6 +1007,23 @@ class Core(commands.Bot):
                         pass
         return register_message
 
+    async def resolve_guild(self, guild_id) -> discord.Guild:
+        """Returns the guild from the gateway cache if possible.
+        Otherwise fetches it over REST; the result, which includes the
+        guild's roles and emojis, is kept for ``REST_CACHE_TTL`` seconds
+        and concurrent fetches of the same guild share one request.
+        """
+        guild = self.get_guild(guild_id)
+        if guild is not None:
+            return guild
+        return await self._rest_guilds.get(guild_id)
+
+    async def resolve_role(self, guild_id, role_id):
+        """Like :meth:`resolve_guild`, but returns one of the guild's roles
+        or ``None`` if it does not exist."""
+        guild = await self.resolve_guild(guild_id)
+        return guild.get_role(role_id)
+
     def get_oauth_url(self):
         return discord.utils.oauth_url(self.user.id)
 
@@ -863,10 +1034,10 @@ class Core(commands.Bot):
         self._load_cogs()
 
         if self.get_prefixes():
-            self.command_prefix = list(self.get_prefixes())
+            self.prefix_table.default = self.get_prefixes()
         else:
             print(strings.no_prefix_set)
-            self.command_prefix = ["!"]
+            self.prefix_table.default = ["!"]
 
         print(strings.logging_into_discord)
 
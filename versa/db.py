@@ -165,3 +165,74 @@ class Database:
         """
         message, _ = await self._load(message, create_if_new=create_if_new)
         return message
+
+    async def wrap_many(self, discord_objs, create_if_new=True, skip_unregistered=False):
+        """Wrap many objects obtained from Discord in their
+        respective versa models at once. Objects of the same
+        model are wrapped together in a constant number of
+        queries, so this is much faster than wrapping them
+        one by one. The wrapped objects are returned in the
+        same order.
+
+        If ``skip_unregistered`` is true, ``None`` is returned
+        in place of users that are not registered or inactive
+        (and of their members and messages) instead of raising.
+        """
+        discord_objs = list(discord_objs)
+        groups = {}
+        for i, discord_obj in enumerate(discord_objs):
+            try:
+                cls = self._model_map[type(discord_obj)]
+            except KeyError:
+                raise TypeError("obj has to be an object from Discord")
+            groups.setdefault(cls, []).append(i)
+
+        wrapped = [None] * len(discord_objs)
+        for cls, indices in groups.items():
+            objs = await cls.from_discord_objs([discord_objs[i] for i in indices], create_if_new=create_if_new,
+                                               skip_unregistered=skip_unregistered)
+            for i, obj in zip(indices, objs):
+                wrapped[i] = obj
+        return wrapped
+
+    async def _load_many(self, cls, discord_objs, create_if_new=True, skip_unregistered=False):
+        return await cls.from_discord_objs(list(discord_objs), create_if_new=create_if_new,
+                                           skip_unregistered=skip_unregistered)
+
+    async def wrap_users(self, users, skip_unregistered=False):
+        """Bulk version of :meth:`wrap_user`; see :meth:`wrap_many`."""
+        users = [user._user if isinstance(user, (discord.Member, MockMember)) else user for user in users]
+        return await self._load_many(self._model_map[discord.User], users, skip_unregistered=skip_unregistered)
+
+    async def wrap_guilds(self, guilds):
+        """Bulk version of :meth:`wrap_guild`; see :meth:`wrap_many`."""
+        return await self._load_many(self._model_map[discord.Guild], guilds)
+
+    async def wrap_text_channels(self, text_channels):
+        """Bulk version of :meth:`wrap_text_channel`; see :meth:`wrap_many`."""
+        return await self._load_many(self._model_map[discord.TextChannel], text_channels)
+
+    async def wrap_voice_channels(self, voice_channels):
+        """Bulk version of :meth:`wrap_voice_channel`; see :meth:`wrap_many`."""
+        return await self._load_many(self._model_map[discord.VoiceChannel], voice_channels)
+
+    async def wrap_category_channels(self, category_channels):
+        """Bulk version of :meth:`wrap_category_channel`; see :meth:`wrap_many`."""
+        return await self._load_many(self._model_map[discord.CategoryChannel], category_channels)
+
+    async def wrap_roles(self, roles):
+        """Bulk version of :meth:`wrap_role`; see :meth:`wrap_many`."""
+        return await self._load_many(self._model_map[discord.Role], roles)
+
+    async def wrap_emojis(self, emojis):
+        """Bulk version of :meth:`wrap_emoji`; see :meth:`wrap_many`."""
+        return await self._load_many(self._model_map[discord.PartialEmoji], emojis)
+
+    async def wrap_members(self, members, skip_unregistered=False):
+        """Bulk version of :meth:`wrap_member`; see :meth:`wrap_many`."""
+        return await self._load_many(self._model_map[discord.Member], members, skip_unregistered=skip_unregistered)
+
+    async def wrap_messages(self, messages, create_if_new=True, skip_unregistered=False):
+        """Bulk version of :meth:`wrap_message`; see :meth:`wrap_many`."""
+        return await self._load_many(self._model_map[discord.Message], messages, create_if_new=create_if_new,
+                                     skip_unregistered=skip_unregistered)
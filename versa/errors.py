@@ -37,6 +37,12 @@ class ResponseTookTooLong(asyncio.TimeoutError):
     pass
 
 
+class ConversationAlreadyRunning(Exception):
+    def __init__(self, *args, key=None):
+        self.key = key
+        super().__init__(*args)
+
+
 class ExtensionNotFound(Exception):
     def __init__(self, *args, name=None):
         self.name = name
@@ -4,19 +4,21 @@
 :license: Apache-2.0 OR MIT
 """
 
-import asyncio
+import json
 import threading
 from functools import partial
 
 import discord
-from django.core.exceptions import SynchronousOnlyOperation
+from discord.utils import snowflake_time, time_snowflake
+from django.core.exceptions import FieldError, SynchronousOnlyOperation
+from django.db import transaction
 from django.db.models import (CASCADE, DO_NOTHING, PROTECT, RESTRICT,
                               SET_DEFAULT, SET_NULL, AutoField, BigAutoField,
                               BigIntegerField, BooleanField)
 from django.db.models import CharField as _CharField
 from django.db.models import DateField, DateTimeField, DecimalField, FloatField
 from django.db.models import ForeignKey as _ForeignKey
-from django.db.models import ForeignObject, IntegerField
+from django.db.models import Field, ForeignObject, IntegerField, Lookup
 from django.db.models import ManyToManyField as _ManyToManyField
 from django.db.models import OneToOneField as _OneToOneField
 from django.db.models import (ProtectedError, RestrictedError,
@@ -37,50 +39,63 @@ from django.db.models.fields.related_descriptors import \
     ReverseOneToOneDescriptor as _ReverseOneToOneDescriptor
 from django.db.models.fields.related_descriptors import (
     create_forward_many_to_many_manager, create_reverse_many_to_one_manager)
+from django.db.models.lookups import GreaterThan, LessThan
+from django.db.models.query import QuerySet
 from django.db.models.signals import pre_delete
 from django.utils.functional import cached_property
 
 from .errors import InactiveUser
 from .i18n import Languages
-from .utils import async_using_db, maybe_coroutine
+from .loader import BatchLoader
+from .utils import Resolved, async_writing_db, get_running_loop, run_in_db
 
 
-class ForeignKeyDeferredAttribute(_ForeignKeyDeferredAttribute):
-    def __get__(self, instance, cls=None):
-        # make ForeignKeys compatible with asyncio
-        try:
-            event_loop = asyncio.get_event_loop()
-        except RuntimeError:
-            return super(ForeignKeyDeferredAttribute, self).__get__(instance, cls=cls)
-        else:
-            if event_loop.is_running():  # and not threading.get_ident() == async_using_db.thread.ident:
-                if self.field.is_cached(instance):
-                    # wrap cached value in coroutine so it will always have to be awaited
-                    # if accessed from an async context to make behavior more consistent
-                    return maybe_coroutine(super(ForeignKeyDeferredAttribute, self).__get__, instance, cls=cls)
-                else:
-                    return async_using_db(super(ForeignKeyDeferredAttribute, self).__get__)(instance, cls=cls)
-            return super(ForeignKeyDeferredAttribute, self).__get__(instance, cls=cls)
-
-
-class ForwardManyToOneDescriptor(_ForwardManyToOneDescriptor):
+class AsyncDescriptorMixin:
+    """Makes a related descriptor asyncio compatible.
+
+    Accessed from the event loop's thread, the descriptor always returns
+    an awaitable so behavior is consistent: a :class:`~versa.utils.Resolved`
+    if the value is already loaded or a future of the query running on
+    the :class:`~versa.utils.DatabaseExecutor` otherwise. Anywhere else
+    (e.g. on the database threads) it behaves like Django's descriptor.
+    """
+
     def __get__(self, instance, cls=None):
         if instance is None:
             return self
+        get = super().__get__
+        if get_running_loop() is None:
+            return get(instance, cls)
+        if self.is_cached(instance):
+            return Resolved(get(instance, cls))
+        return run_in_db(get, instance, cls)
+
+
+class ForeignKeyDeferredAttribute(AsyncDescriptorMixin, _ForeignKeyDeferredAttribute):
+    def is_cached(self, instance):
+        return self.field.attname in instance.__dict__
 
+
+class ForwardManyToOneDescriptor(AsyncDescriptorMixin, _ForwardManyToOneDescriptor):
+    def __get__(self, instance, cls=None):
+        if instance is None or get_running_loop() is None or self.is_cached(instance):
+            return super().__get__(instance, cls)
+        # coalesce the lookups of all instances made in the same loop iteration
+        value = instance.__dict__.get(self.field.attname)
+        if value is None or not self.field.target_field.primary_key:
+            return super().__get__(instance, cls)
+        return self._load(instance, value)
+
+    async def _load(self, instance, value):
+        related_model = self.field.remote_field.model
         try:
-            event_loop = asyncio.get_event_loop()
-        except RuntimeError:
-            return super(ForwardManyToOneDescriptor, self).__get__(instance, cls=cls)
-        else:
-            if event_loop.is_running():  # and not threading.get_ident() == async_using_db.thread.ident:
-                if self.field.is_cached(instance):
-                    # wrap cached value in coroutine so it will always have to be awaited
-                    # if accessed from an async context to make behavior more consistent
-                    return maybe_coroutine(super(ForwardManyToOneDescriptor, self).__get__, instance, cls=cls)
-                else:
-                    return async_using_db(super(ForwardManyToOneDescriptor, self).__get__)(instance, cls=cls)
-            return super(ForwardManyToOneDescriptor, self).__get__(instance, cls=cls)
+            rel_obj = await BatchLoader.for_model(related_model).load(value)
+        except related_model.DoesNotExist:
+            raise self.RelatedObjectDoesNotExist(
+                "%s has no %s." % (self.field.model.__name__, self.field.name)
+            )
+        self.field.set_cached_value(instance, rel_obj)
+        return rel_obj
 
 
 # Make calls to related fields' methods async
@@ -95,31 +110,31 @@ class ReverseManyToOneDescriptor(_ReverseManyToOneDescriptor):
             related_model._default_manager.__class__,
             self.rel,
         )):
-            @async_using_db
+            @async_writing_db
             def async_create(self, **kwargs):
                 self.create(**kwargs)
 
-            @async_using_db
+            @async_writing_db
             def async_get_or_create(self, **kwargs):
                 self.get_or_create(**kwargs)
 
-            @async_using_db
+            @async_writing_db
             def async_update_or_create(self, **kwargs):
                 return self.update_or_create(**kwargs)
 
-            @async_using_db
+            @async_writing_db
             def async_clear(self, *, bulk=True):
                 self.clear(bulk=bulk)
 
-            @async_using_db
+            @async_writing_db
             def async_set(self, objs, *, bulk=True, clear=False):
                 return self.set(objs, bulk=bulk, clear=clear)
 
-            @async_using_db
+            @async_writing_db
             def async_remove(self, *args, **kwargs):
                 return self.remove(*args, **kwargs)
 
-            @async_using_db
+            @async_writing_db
             def async_add(self, *args, **kwargs):
                 return self.add(*args, **kwargs)
 
@@ -136,75 +151,43 @@ class ManyToManyDescriptor(_ManyToManyDescriptor):
             self.rel,
             reverse=self.reverse,
         )):
-            @async_using_db
+            @async_writing_db
             def async_create(self, **kwargs):
                 self.create(**kwargs)
 
-            @async_using_db
+            @async_writing_db
             def async_get_or_create(self, *, through_defaults=None, **kwargs):
                 self.get_or_create(through_defaults=through_defaults, **kwargs)
 
-            @async_using_db
+            @async_writing_db
             def async_update_or_create(self, *, through_defaults=None, **kwargs):
                 return self.update_or_create(through_defaults=through_defaults, **kwargs)
 
-            @async_using_db
+            @async_writing_db
             def async_clear(self):
                 self.clear()
 
-            @async_using_db
+            @async_writing_db
             def async_set(self, objs, *, clear=False, through_defaults=None):
                 return self.set(objs, clear=clear, through_defaults=through_defaults)
 
-            @async_using_db
+            @async_writing_db
             def async_remove(self, *args, **kwargs):
                 return self.remove(*args, **kwargs)
 
-            @async_using_db
+            @async_writing_db
             def async_add(self, *args, **kwargs):
                 return self.add(*args, **kwargs)
 
         return ManyRelatedManager
 
 
-class ReverseOneToOneDescriptor(_ReverseOneToOneDescriptor):
-    def __get__(self, instance, cls=None):
-        if instance is None:
-            return self
+class ReverseOneToOneDescriptor(AsyncDescriptorMixin, _ReverseOneToOneDescriptor):
+    pass
 
-        try:
-            event_loop = asyncio.get_event_loop()
-        except RuntimeError:
-            return super(_ReverseOneToOneDescriptor, self).__get__(instance, cls=cls)
-        else:
-            if event_loop.is_running():  # and not threading.get_ident() == async_using_db.thread.ident:
-                if self.field.is_cached(instance):
-                    # wrap cached value in coroutine so it will always have to be awaited
-                    # if accessed from an async context to make behavior more consistent
-                    return maybe_coroutine(super(_ReverseOneToOneDescriptor, self).__get__, instance, cls=cls)
-                else:
-                    return async_using_db(super(_ReverseOneToOneDescriptor, self).__get__)(instance, cls=cls)
-            return super(_ReverseOneToOneDescriptor, self).__get__(instance, cls=cls)
-
-
-class ForwardOneToOneDescriptor(_ForwardOneToOneDescriptor):
-    def __get__(self, instance, cls=None):
-        if instance is None:
-            return self
 
-        try:
-            event_loop = asyncio.get_event_loop()
-        except RuntimeError:
-            return super(_ForwardOneToOneDescriptor, self).__get__(instance, cls=cls)
-        else:
-            if event_loop.is_running():  # and not threading.get_ident() == async_using_db.thread.ident:
-                if self.field.is_cached(instance):
-                    # wrap cached value in coroutine so it will always have to be awaited
-                    # if accessed from an async context to make behavior more consistent
-                    return maybe_coroutine(super(_ForwardOneToOneDescriptor, self).__get__, instance, cls=cls)
-                else:
-                    return async_using_db(super(_ForwardOneToOneDescriptor, self).__get__)(instance, cls=cls)
-            return super(_ForwardOneToOneDescriptor, self).__get__(instance, cls=cls)
+class ForwardOneToOneDescriptor(AsyncDescriptorMixin, _ForwardOneToOneDescriptor):
+    pass
 
 
 class ForeignKey(_ForeignKey):
@@ -218,6 +201,12 @@ class OneToOneField(_OneToOneField):
     forward_related_accessor_class = ForwardOneToOneDescriptor
 
 
+def _is_hidden(rel):
+    # Django 5.1 replaced ForeignObjectRel.is_hidden() with the hidden property
+    is_hidden = getattr(rel, 'is_hidden', None)
+    return is_hidden() if is_hidden is not None else rel.hidden
+
+
 class ManyToManyField(_ManyToManyField):
     def contribute_to_class(self, cls, name, **kwargs):
         # To support multiple relations to self, it's useful to have a non-None
@@ -229,7 +218,7 @@ class ManyToManyField(_ManyToManyField):
         if self.remote_field.symmetrical and (
             self.remote_field.model == "self" or self.remote_field.model == cls._meta.object_name):
             self.remote_field.related_name = "%s_rel_+" % name
-        elif self.remote_field.is_hidden():
+        elif _is_hidden(self.remote_field):
             # If the backwards relation is disabled, replace the original
             # related_name with one generated from the m2m field name. Django
             # still uses backwards relations internally and we need to avoid
@@ -259,7 +248,7 @@ class ManyToManyField(_ManyToManyField):
     def contribute_to_related_class(self, cls, related):
         # Internal M2Ms (i.e., those with a related name ending with '+')
         # and swapped models don't get a related descriptor.
-        if not self.remote_field.is_hidden() and not related.related_model._meta.swapped:
+        if not _is_hidden(self.remote_field) and not related.related_model._meta.swapped:
             setattr(cls, related.get_accessor_name(), ManyToManyDescriptor(self.remote_field, reverse=True))
 
         # Set up the accessors for the column names on the m2m table.
@@ -284,6 +273,59 @@ class CharField(_CharField):
         super().__init__(*args, **kwargs)
 
 
+class SnowflakeField(BigIntegerField):
+    """A Discord ID. Since snowflakes encode their creation time, the model
+    gets a ``created_at`` attribute (``<name>_created_at`` if the field
+    isn't the primary key) and the field supports the ``created_after``
+    and ``created_before`` lookups, e.g. ``id__created_after=datetime``.
+    These compile to integer comparisons that can use the field's index.
+
+    The column is a plain ``bigint``, so migrations see a ``BigIntegerField``.
+    """
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        return name, 'django.db.models.BigIntegerField', args, kwargs
+
+    def contribute_to_class(self, cls, name, private_only=False):
+        super().contribute_to_class(cls, name, private_only=private_only)
+        created_at_name = 'created_at' if self.primary_key else f'{name}_created_at'
+        if not hasattr(cls, created_at_name):
+            attname = self.attname
+
+            def created_at(instance):
+                snowflake = instance.__dict__.get(attname)
+                return snowflake_time(snowflake) if snowflake is not None else None
+
+            setattr(cls, created_at_name, property(created_at))
+
+
+class _SnowflakeTimeLookupMixin:
+    high = False
+
+    def get_prep_lookup(self):
+        if hasattr(self.rhs, 'resolve_expression'):
+            return super().get_prep_lookup()
+        return time_snowflake(self.rhs, high=self.high)
+
+    def get_rhs_op(self, connection, rhs):
+        # connection.operators only knows the names of the builtin lookups
+        return connection.operators[self.operator] % rhs
+
+
+@SnowflakeField.register_lookup
+class CreatedAfter(_SnowflakeTimeLookupMixin, GreaterThan):
+    lookup_name = 'created_after'
+    operator = 'gt'
+    high = True
+
+
+@SnowflakeField.register_lookup
+class CreatedBefore(_SnowflakeTimeLookupMixin, LessThan):
+    lookup_name = 'created_before'
+    operator = 'lt'
+
+
 class DiscordField(ForeignKey):
     _discord_cls = None
     _discord_obj = None
@@ -330,6 +372,61 @@ class RoleField(DiscordField):
     _discord_cls = discord.Role
 
 
+class ReverseCascade:
+    """Collects the rows referenced by rows deleted by one deletion (e.g.
+    one ``QuerySet.delete()`` call) and deletes them with one query per
+    model once its transaction commits, instead of one query per deleted
+    row.
+
+    Django sends ``pre_delete`` for every row of a deletion with the same
+    ``origin`` before deleting any of them, which is what groups the rows;
+    the state of a deletion is dropped as soon as a row of another
+    deletion arrives.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @staticmethod
+    def is_cascading(model, origin):
+        """Whether a deletion started by ``origin`` has to be cascaded to
+        ``model``; not if ``model`` is where the deletion started."""
+        origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+        return origin_model is not model
+
+    def _deletion(self, origin, using):
+        deletion = getattr(self._local, 'deletion', None)
+        if (deletion is None or origin is None or deletion['origin'] is not origin
+                or deletion['using'] != using or deletion['flushed']):
+            deletion = {'origin': origin, 'using': using, 'flushed': False, 'to_delete': {}, 'memo': {}}
+
+            def flush():
+                deletion['flushed'] = True
+                for model, pks in deletion['to_delete'].items():
+                    model._base_manager.using(using).filter(pk__in=pks).delete()
+
+            self._local.deletion = deletion
+            transaction.on_commit(flush, using=using)
+        return deletion
+
+    def memo(self, origin, using, key, load):
+        """Returns the result of ``load()``, which is called once per deletion and ``key``."""
+        memo = self._deletion(origin, using)['memo']
+        try:
+            return memo[key]
+        except KeyError:
+            result = memo[key] = load()
+            return result
+
+    def add(self, model, pks, using, origin=None):
+        pks = {pk for pk in pks if pk is not None}
+        if pks:
+            self._deletion(origin, using)['to_delete'].setdefault(model, set()).update(pks)
+
+
+reverse_cascade = ReverseCascade()
+
+
 class EmojiField(DiscordField):
     _discord_cls = discord.Emoji
 
@@ -337,10 +434,10 @@ class EmojiField(DiscordField):
         self.reverse_cascade = kwargs.pop('reverse_cascade', True)
         super(EmojiField, self).__init__(*args, **kwargs)
 
-    def _reverse_cascade(self, sender, instance, using, **kwargs):
-        emoji = getattr(instance, self.name)
-        if emoji:
-            emoji.delete()
+    def _reverse_cascade(self, sender, instance, using, origin=None, **kwargs):
+        emoji_model = self.remote_field.model
+        if origin is None or reverse_cascade.is_cascading(emoji_model, origin):
+            reverse_cascade.add(emoji_model, (getattr(instance, self.attname),), using, origin)
 
     def contribute_to_class(self, cls, name, private_only=False, **kwargs):
         super(EmojiField, self).contribute_to_class(cls, name, private_only=private_only, **kwargs)
@@ -397,15 +494,33 @@ class ManyEmojisField(ManyDiscordField):
         self.reverse_cascade = kwargs.pop('reverse_cascade', True)
         super(ManyEmojisField, self).__init__(*args, **kwargs)
 
-    def _reverse_cascade(self, sender, instance, using, **kwargs):
-        emojis = getattr(instance, self.name)
-        if emojis is not None:
-            for emoji in emojis:
-                emoji.delete()
+    def _emoji_pks(self, instance, using, origin):
+        through = self.remote_field.through
+        emoji_attname = through._meta.get_field(self.m2m_reverse_field_name()).attname
+        if isinstance(origin, QuerySet) and origin.model is type(instance):
+            # one query for all rows of the deletion
+            def load():
+                emojis = {}
+                for pk, emoji_pk in origin.using(using).values_list('pk', self.name):
+                    emojis.setdefault(pk, []).append(emoji_pk)
+                return emojis
+            emojis = reverse_cascade.memo(origin, using, self, load)
+            if instance.pk in emojis:
+                return emojis[instance.pk]
+        # e.g. deleted on its own or by a cascade from another model
+        return through._base_manager.using(using).filter(**{self.m2m_field_name(): instance.pk}) \
+            .values_list(emoji_attname, flat=True)
+
+    def _reverse_cascade(self, sender, instance, using, origin=None, **kwargs):
+        # the through model's rows are deleted without signals, so the
+        # emojis are collected when the rows owning them are deleted
+        emoji_model = self.remote_field.model
+        if origin is None or reverse_cascade.is_cascading(emoji_model, origin):
+            reverse_cascade.add(emoji_model, self._emoji_pks(instance, using, origin), using, origin)
 
     def contribute_to_class(self, cls, name, private_only=False, **kwargs):
         super(ManyEmojisField, self).contribute_to_class(cls, name, private_only=private_only, **kwargs)
-        if self.reverse_cascade:
+        if self.reverse_cascade and not cls._meta.abstract:
             pre_delete.connect(self._reverse_cascade, sender=cls)
 
 
@@ -476,3 +591,130 @@ class SeparatedValuesField(CharField):
 
     def from_db_value(self, value, expression, connection):
         return self.to_python(value)
+
+
+class ListField(Field):
+    """A list of values of ``base_field``, stored natively so it doesn't
+    have to be parsed from a string on every load: as an array on
+    PostgreSQL and as JSON on MySQL and SQLite (JSON1).
+
+    Supports the ``contains`` (the list contains a value) and ``overlap``
+    (the list shares at least one value with another list) lookups as well
+    as ``exact`` and ``isnull``. On PostgreSQL these use the ``@>`` and
+    ``&&`` operators, so they can use a ``GinIndex`` on the field. The
+    other lookups of :class:`~django.db.models.Field`, such as
+    ``icontains`` and ``startswith``, would compare the list's text form
+    and aren't supported.
+
+    :param base_field:
+        The field describing the type of the values, e.g. ``BigIntegerField()``.
+    """
+
+    empty_strings_allowed = False
+    supported_lookups = frozenset({'exact', 'isnull', 'contains', 'overlap'})
+
+    def __init__(self, base_field, **kwargs):
+        kwargs.setdefault('default', list)
+        self.base_field = base_field
+        super().__init__(**kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['base_field'] = self.base_field.clone()
+        if kwargs.get('default') is list:
+            del kwargs['default']
+        return name, path, args, kwargs
+
+    def set_attributes_from_name(self, name):
+        super().set_attributes_from_name(name)
+        self.base_field.set_attributes_from_name(name)
+
+    def get_lookup(self, lookup_name):
+        if lookup_name not in self.supported_lookups:
+            return None
+        return super().get_lookup(lookup_name)
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return f'{self.base_field.db_type(connection)}[]'
+        if connection.vendor == 'mysql':
+            return 'json'
+        return 'text'
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        return [self.base_field.get_prep_value(_value) for _value in value]
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is None or connection.vendor == 'postgresql':
+            return value
+        return json.dumps(value)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        if isinstance(value, str):
+            value = json.loads(value)
+        if hasattr(self.base_field, 'from_db_value'):
+            return [self.base_field.from_db_value(_value, expression, connection) for _value in value]
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, str):
+            value = json.loads(value)
+        if value is None:
+            return value
+        return [self.base_field.to_python(_value) for _value in value]
+
+    def value_to_string(self, obj):
+        return json.dumps(self.get_prep_value(self.value_from_object(obj)))
+
+
+class _ListLookup(Lookup):
+    postgres_operator = None
+    mysql_function = None
+
+    def _check_rhs(self):
+        # the rhs is cast to the field's type, which columns of another type can't be
+        if hasattr(self.rhs, 'resolve_expression'):
+            raise FieldError(f"The {self.lookup_name} lookup of a ListField only takes values, "
+                             f"not {type(self.rhs).__name__} expressions")
+
+    def get_db_prep_lookup(self, value, connection):
+        return '%s', [self.lhs.output_field.get_db_prep_value(value, connection, prepared=True)]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        params = (*lhs_params, *rhs_params)
+        if connection.vendor == 'postgresql':
+            return f'{lhs} {self.postgres_operator} {rhs}::{self.lhs.output_field.db_type(connection)}', params
+        if connection.vendor == 'mysql':
+            return f'{self.mysql_function}({lhs}, {rhs})', params
+        return (f'EXISTS (SELECT 1 FROM json_each({lhs}) AS _lhs, json_each({rhs}) AS _rhs '
+                f'WHERE _lhs.value = _rhs.value)', params)
+
+
+@ListField.register_lookup
+class ListContains(_ListLookup):
+    lookup_name = 'contains'
+    postgres_operator = '@>'
+    mysql_function = 'JSON_CONTAINS'
+
+    def get_prep_lookup(self):
+        self._check_rhs()
+        return self.lhs.output_field.get_prep_value([self.rhs])
+
+
+@ListField.register_lookup
+class ListOverlap(_ListLookup):
+    lookup_name = 'overlap'
+    postgres_operator = '&&'
+    mysql_function = 'JSON_OVERLAPS'
+
+    def get_prep_lookup(self):
+        self._check_rhs()
+        return self.lhs.output_field.get_prep_value(list(self.rhs))
@@ -0,0 +1,177 @@
+"""versa-framework: A framework to make discord bots
+
+:copyright: (c) 2022 devcbezerra.
+:license: Apache-2.0 OR MIT
+"""
+
+import threading
+from array import array
+from bisect import bisect_left
+
+
+class SnowflakeSet:
+    """A compact set of Discord IDs, stored as a sorted array of
+    unsigned 64-bit integers (8 bytes per ID).
+
+    Membership tests are ``O(log n)``, insertions and removals are
+    ``O(n)`` but only move memory.
+    """
+
+    __slots__ = ('_ids',)
+
+    def __init__(self, ids=()):
+        self._ids = array('Q', sorted(set(ids)))
+
+    def __contains__(self, snowflake):
+        ids = self._ids
+        i = bisect_left(ids, snowflake)
+        return i < len(ids) and ids[i] == snowflake
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def add(self, snowflake):
+        ids = self._ids
+        i = bisect_left(ids, snowflake)
+        if i == len(ids) or ids[i] != snowflake:
+            ids.insert(i, snowflake)
+
+    def discard(self, snowflake):
+        ids = self._ids
+        i = bisect_left(ids, snowflake)
+        if i < len(ids) and ids[i] == snowflake:
+            del ids[i]
+
+
+class UserIndex:
+    """In-process index of the IDs of all registered users and whether
+    they are active, so inactive users can be rejected without a
+    database query.
+
+    The index is only used once :meth:`load` has been called; :attr:`loaded`
+    is ``False`` before that. It only sees the changes made by this process
+    and the rows this process reads, so users it doesn't know have to be
+    looked up in the database.
+    """
+
+    def __init__(self):
+        self.active = SnowflakeSet()
+        self.inactive = SnowflakeSet()
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self, rows):
+        """Replaces the index' contents.
+
+        :param rows:
+            An iterable of ``(user_id, is_active)`` tuples.
+        """
+        active = []
+        inactive = []
+        for user_id, is_active in rows:
+            (active if is_active else inactive).append(user_id)
+        with self._lock:
+            self.active = SnowflakeSet(active)
+            self.inactive = SnowflakeSet(inactive)
+            self.loaded = True
+
+    def get(self, user_id):
+        """Returns ``True`` if the user is registered and active, ``False``
+        if the user is inactive and ``None`` if the user is unknown."""
+        if user_id in self.active:
+            return True
+        if user_id in self.inactive:
+            return False
+        return None
+
+    def set(self, user_id, is_active):
+        with self._lock:
+            # add before discarding so concurrent readers never miss the user
+            if is_active:
+                self.active.add(user_id)
+                self.inactive.discard(user_id)
+            else:
+                self.inactive.add(user_id)
+                self.active.discard(user_id)
+
+    def discard(self, user_id):
+        with self._lock:
+            self.active.discard(user_id)
+            self.inactive.discard(user_id)
+
+
+class PrefixTable:
+    """In-process table of the command prefixes of all guilds, so prefixes
+    can be resolved without a database query.
+
+    Guilds without a prefix of their own use :attr:`default`. Prefixes are
+    matched through an index of the prefixes by their first character;
+    guilds with the same prefixes share one index.
+    """
+
+    def __init__(self, default=('!',)):
+        self._guilds = {}
+        self._indexes = {}
+        self._default = ()
+        self.default = default
+
+    @property
+    def default(self):
+        """The prefixes of guilds without a prefix of their own and of DMs."""
+        return self._default
+
+    @default.setter
+    def default(self, prefixes):
+        self._default = tuple(prefixes)
+
+    def load(self, rows):
+        """Replaces the guilds' prefixes.
+
+        :param rows:
+            An iterable of ``(guild_id, prefix)`` tuples.
+        """
+        self._guilds = {guild_id: (prefix,) for guild_id, prefix in rows if prefix}
+
+    def get(self, guild_id):
+        """Returns the prefixes of the guild with the ID ``guild_id``."""
+        return self._guilds.get(guild_id, self._default)
+
+    def set(self, guild_id, prefix):
+        if prefix:
+            self._guilds[guild_id] = (prefix,)
+        else:
+            self._guilds.pop(guild_id, None)
+
+    def discard(self, guild_id):
+        self._guilds.pop(guild_id, None)
+
+    def _index(self, prefixes):
+        try:
+            return self._indexes[prefixes]
+        except KeyError:
+            pass
+        index = {}
+        # longest first so the longest matching prefix wins
+        for prefix in sorted(set(prefixes), key=len, reverse=True):
+            if prefix:
+                index.setdefault(prefix[0], []).append(prefix)
+        self._indexes[prefixes] = index
+        return index
+
+    def match(self, content, guild_id=None):
+        """Returns the prefix of the guild with the ID ``guild_id`` that
+        ``content`` starts with or ``None``.
+
+        :param guild_id:
+            ``None`` for DMs.
+        """
+        if not content:
+            return None
+        prefixes = self._default if guild_id is None else self._guilds.get(guild_id, self._default)
+        for prefix in self._index(prefixes).get(content[0], ()):
+            if content.startswith(prefix):
+                return prefix
+        return None
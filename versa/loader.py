@@ -0,0 +1,119 @@
+"""versa-framework: A framework to make discord bots
+
+:copyright: (c) 2022 devcbezerra.
+:license: Apache-2.0 OR MIT
+"""
+
+import asyncio
+import copy
+
+from django.db.models import prefetch_related_objects
+
+from .rowcache import get_row_cache
+from .utils import run_in_db
+
+
+class BatchLoader:
+    """Collects the primary key lookups of one model that are made in
+    the same event loop iteration and resolves all of them with a
+    single ``pk__in`` query, after consulting the
+    :class:`~versa.rowcache.RowCache` for models that use it.
+
+    Use :meth:`for_model` to get the loader of a model; any Django model
+    can be loaded, not only versa's.
+
+    :param model:
+        The model class whose rows are loaded.
+    :ivar int batch_size:
+        The maximum number of primary keys per query.
+    """
+
+    batch_size = 500
+
+    _loaders = {}
+
+    def __init__(self, model):
+        self.model = model
+        self._pending = {}
+
+    @classmethod
+    def for_model(cls, model):
+        try:
+            return cls._loaders[model]
+        except KeyError:
+            loader = cls._loaders[model] = cls(model)
+            return loader
+
+    def load(self, pk):
+        """Returns a future resolving to the row with the primary key ``pk``
+        or raising ``model.DoesNotExist``."""
+        loop = asyncio.get_running_loop()
+        pk = self.model._meta.pk.to_python(pk)
+        future = loop.create_future()
+        if not self._pending:
+            loop.call_soon(self._dispatch, loop)
+        self._pending.setdefault(pk, []).append(future)
+        return future
+
+    def _dispatch(self, loop):
+        pending, self._pending = self._pending, {}
+        pks = list(pending)
+        for i in range(0, len(pks), self.batch_size):
+            batch = {pk: pending[pk] for pk in pks[i:i + self.batch_size]}
+            loop.create_task(self._resolve(batch))
+
+    async def _resolve(self, pending):
+        row_cache = get_row_cache() if getattr(self.model, '_row_cache', False) else None
+        try:
+            # the manager Django uses for related objects, also for models that aren't versa's
+            manager = self.model._base_manager
+            using = manager.db
+            objs = await row_cache.get_many(self.model, list(pending), using) if row_cache is not None else {}
+            missing = [pk for pk in pending if pk not in objs]
+            if missing:
+                queryset = manager.using(using).filter(pk__in=missing)
+                related_plan = getattr(self.model, '_related_plan', ())
+                if related_plan:
+                    queryset = queryset.select_related(*related_plan)
+                generation = row_cache.generation(self.model) if row_cache is not None else None
+                if hasattr(queryset, 'async_to_list'):
+                    fetched = await queryset.async_to_list()
+                else:
+                    fetched = await run_in_db(list, queryset)
+                if row_cache is not None:
+                    await row_cache.set_many(self.model, fetched, generation)
+                objs.update((obj.pk, obj) for obj in fetched)
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for pk, futures in pending.items():
+            obj = objs.get(pk)
+            for i, future in enumerate(futures):
+                if future.done():
+                    continue
+                if obj is None:
+                    future.set_exception(self.model.DoesNotExist(
+                        f"{self.model._meta.object_name} matching query does not exist."
+                    ))
+                else:
+                    # every waiter gets its own instance
+                    future.set_result(obj if i == 0 else copy.copy(obj))
+
+
+async def prefetch(instances, *lookups):
+    """Fills the relation caches of ``instances`` for ``lookups`` (e.g.
+    ``'channel__guild'``) with one query per relation, so the related
+    objects don't have to be awaited one by one.
+
+    :param instances:
+        The model instances; all of them need to be of the same model.
+    :param lookups:
+        Lookups as accepted by Django's ``prefetch_related``.
+    """
+    instances = list(instances)
+    if instances:
+        await run_in_db(prefetch_related_objects, instances, *lookups)
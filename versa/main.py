@@ -41,10 +41,10 @@ def main(test, **kwargs):
         os.environ['DB_PASSWORD'] = prompt("DB password", value_proc=str, hide_input=True)
 
     cache_type = os.getenv('CACHE_TYPE')
-    if os.getenv('CACHE_TYPE') != 'simple' and not os.getenv('CACHE_HOST'):
+    if os.getenv('CACHE_TYPE') not in ('simple', 'tiered_local') and not os.getenv('CACHE_HOST'):
         os.environ['CACHE_HOST'] = prompt("Cache host", value_proc=str, default='localhost')
         os.environ['CACHE_PORT'] = prompt("Cache port", value_proc=str,
-                                          default='6379' if cache_type == 'redis' else None)
+                                          default='6379' if cache_type in ('redis', 'tiered') else None)
         os.environ['CACHE_PASSWORD'] = input("Cache password: ")
         os.environ['CACHE_DB'] = prompt("Cache number", value_proc=str, default='0')
 
@@ -95,6 +95,10 @@ def main(test, **kwargs):
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "versa.django_settings")
     django.setup(set_prefix=False)
 
+    # setup native async database driver
+    from versa import aiodb
+    aiodb.init()
+
     # setup asyncio loop
     try:
         # noinspection PyUnresolvedReferences
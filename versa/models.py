@@ -4,49 +4,79 @@
 :license: Apache-2.0 OR MIT
 """
 
+import copy
 import inspect
+import sqlite3
+import threading
+from collections import OrderedDict
 
 import discord
 import versa
 from discord.ext.commands import converter
 from django.conf import settings as django_settings
+from django.db import connections
 from django.db import models as _models
 from django.db.models import Count, Max, Min, Q, Sum, prefetch_related_objects
 from django.db.models.fields.reverse_related import ForeignObjectRel
-from versa import fields
+from django.db.models.signals import class_prepared, post_delete, post_save
+from versa import aiodb, fields
 
 from .errors import InactiveUser, UserDoesNotExist
+from .index import PrefixTable, UserIndex
+from .loader import BatchLoader
+from .rowcache import get_row_cache
 # temporary fix until Django's ORM is async
-from .utils import MockMember, async_using_db
+from .utils import MockMember, async_using_db, async_writing_db
+
+
+def _invalidate_cached_row(sender, instance, **kwargs):
+    row_cache = get_row_cache()
+    if row_cache is not None:
+        row_cache.invalidate(sender, instance.pk)
+
+
+def _connect_row_cache(sender, **kwargs):
+    if getattr(sender, '_row_cache', False):
+        post_save.connect(_invalidate_cached_row, sender=sender)
+        post_delete.connect(_invalidate_cached_row, sender=sender)
+
+
+class_prepared.connect(_connect_row_cache)
 
 
 class QuerySet(_models.QuerySet):
-    @async_using_db
-    def async_get(self, *args, **kwargs):
-        return super(QuerySet, self).get(*args, **kwargs)
+    async def async_get(self, *args, **kwargs):
+        obj = await aiodb.run('get', self, *args, **kwargs)
+        if obj is NotImplemented:
+            obj = await self._async_get(*args, **kwargs)
+        return obj
     async_get.__doc__ = _models.QuerySet.get.__doc__
 
     @async_using_db
+    def _async_get(self, *args, **kwargs):
+        return super(QuerySet, self).get(*args, **kwargs)
+
+    @async_writing_db
     def async_create(self, **kwargs):
         return super(QuerySet, self).create(**kwargs)
     async_create.__doc__ = _models.QuerySet.create.__doc__
 
-    @async_using_db
+    @async_writing_db
     def async_get_or_create(self, *args, **kwargs):
         return super(QuerySet, self).get_or_create(*args, **kwargs)
     async_get_or_create.__doc__ = _models.QuerySet.get_or_create.__doc__
 
-    @async_using_db
+    @async_writing_db
     def async_update_or_create(self, *args, **kwargs):
         return super(QuerySet, self).update_or_create(*args, **kwargs)
     async_update_or_create.__doc__ = _models.QuerySet.update_or_create.__doc__
 
-    @async_using_db
+    @async_writing_db
     def async_bulk_create(self, *args, **kwargs):
         return super(QuerySet, self).bulk_create(*args, **kwargs)
     async_bulk_create.__doc__ = _models.QuerySet.bulk_create.__doc__
 
-    @async_using_db
+    @async_writing_db
     def async_bulk_update(self, *args, **kwargs):
         return super(QuerySet, self).bulk_update(*args, **kwargs)
     async_bulk_update.__doc__ = _models.QuerySet.bulk_update.__doc__
@@ -76,10 +106,16 @@ class QuerySet(_models.QuerySet):
         return super(QuerySet, self).earliest(*args)
     async_earliest.__doc__ = _models.QuerySet.earliest.__doc__
 
+    async def async_first(self):
+        obj = await aiodb.run('first', self)
+        if obj is NotImplemented:
+            obj = await self._async_first()
+        return obj
+    async_first.__doc__ = _models.QuerySet.first.__doc__
+
     @async_using_db
-    def async_first(self):
+    def _async_first(self):
         return super(QuerySet, self).first()
-    async_first.__doc__ = _models.QuerySet.first.__doc__
 
     @async_using_db
     def async_last(self):
@@ -91,23 +127,35 @@ class QuerySet(_models.QuerySet):
         return super(QuerySet, self).aggregate(*args, **kwargs)
     async_aggregate.__doc__ = _models.QuerySet.aggregate.__doc__
 
-    @async_using_db
-    def async_exists(self):
-        return super(QuerySet, self).exists()
+    async def async_exists(self):
+        exists = await aiodb.run('exists', self)
+        if exists is NotImplemented:
+            exists = await self._async_exists()
+        return exists
     async_exists.__doc__ = _models.QuerySet.exists.__doc__
 
     @async_using_db
+    def _async_exists(self):
+        return super(QuerySet, self).exists()
+
+    @async_writing_db
     def async_update(self, **kwargs):
         return super(QuerySet, self).update(**kwargs)
     async_update.__doc__ = _models.QuerySet.update.__doc__
 
-    @async_using_db
+    @async_writing_db
     def async_delete(self):
         return super(QuerySet, self).delete()
     async_delete.__doc__ = _models.QuerySet.delete.__doc__
 
+    async def async_to_list(self):
+        objs = await aiodb.run('to_list', self)
+        if objs is NotImplemented:
+            objs = await self._async_to_list()
+        return objs
+
     @async_using_db
-    def async_to_list(self):
+    def _async_to_list(self):
         return list(self)
 
 
@@ -161,6 +209,8 @@ class Model(_models.Model):
     custom_default_manager = Manager()
     _cached_core = None
     _is_loaded = False
+    # whether primary key lookups of this model use the RowCache (MODEL_CACHE)
+    _row_cache = False
 
     @property
     def _core(self):
@@ -197,7 +247,7 @@ class Model(_models.Model):
                 self.objects.prefetch_related(prefetch_related)
         self._is_loaded = True
 
-    @async_using_db
+    @async_writing_db
     def async_save(self, **kwargs):
         super().save(**kwargs)
 
@@ -208,21 +258,25 @@ class Model(_models.Model):
     def validate(self):
         self.full_clean()
 
-    @async_using_db
+    @async_writing_db
     def async_delete(self, keep_parents=False, **kwargs):
         super().delete(keep_parents=keep_parents, **kwargs)
 
     @classmethod
-    @async_using_db
-    def async_get(cls, **kwargs):
-        return cls.objects.get(**kwargs)
+    async def async_get(cls, **kwargs):
+        if len(kwargs) == 1:
+            (lookup, value), = kwargs.items()
+            if lookup in ('pk', cls._meta.pk.name):
+                # batched with other primary key lookups of the same event loop iteration
+                return await BatchLoader.for_model(cls).load(value)
+        return await cls.objects.async_get(**kwargs)
 
     @classmethod
     def get(cls, **kwargs):
         return cls.objects.get(**kwargs)
 
     @classmethod
-    @async_using_db
+    @async_writing_db
     def async_create(cls, **kwargs):
         return cls.objects.create(**kwargs)
 
@@ -231,7 +285,7 @@ class Model(_models.Model):
         return cls.objects.create(**kwargs)
 
     @classmethod
-    @async_using_db
+    @async_writing_db
     def async_get_or_create(cls, defaults=None, **kwargs):
         return cls.objects.get_or_create(defaults=defaults, **kwargs)
 
@@ -240,7 +294,7 @@ class Model(_models.Model):
         return cls.objects.get_or_create(defaults=defaults, **kwargs)
 
     @classmethod
-    @async_using_db
+    @async_writing_db
     def async_update_or_create(cls, defaults=None, **kwargs):
         return cls.objects.update_or_create(defaults=defaults, **kwargs)
 
@@ -257,6 +311,8 @@ class CoreSettings(Model):
     lang = fields.LanguageField()
     home = fields.GuildField(blank=True, null=True, on_delete=fields.SET_NULL)
 
+    _row_cache = True
+
 
 class DiscordModel(Model):
     class Meta:
@@ -265,23 +321,135 @@ class DiscordModel(Model):
     _discord_obj = None
     _discord_cls = None
     _discord_converter_cls = None
+    # whether from_discord_obj may look up existing rows by ID only,
+    # batched with other lookups of the same event loop iteration
+    _batch_lookups = False
+    # Discord classes accepted by sync_from_discord_objs besides _discord_cls
+    _bulk_discord_classes = ()
+    # select_related lookups joined into lookups when no other plan is passed
+    _related_plan = ()
 
     @classmethod
-    @async_using_db
-    def from_discord_obj(cls, discord_obj, create_if_new=True):
-        obj, existed_already = cls.sync_from_discord_obj(discord_obj, create_if_new=create_if_new)
+    def with_related(cls, related=None):
+        """Returns a queryset that joins the relations of the plan ``related``
+        into its queries, so the related objects are cached on the results.
+
+        :param related:
+            A tuple of ``select_related`` lookups, e.g. ``('channel__guild',)``.
+            ``None`` uses the model's default plan, ``()`` joins nothing.
+        """
+        if related is None:
+            related = cls._related_plan
+        return cls.objects.select_related(*related) if related else cls.objects.all()
+
+    @classmethod
+    async def async_get(cls, related=None, **kwargs):
+        if related is None and len(kwargs) == 1:
+            # primary key lookups are batched by the BatchLoader using the default plan
+            return await super().async_get(**kwargs)
+        return await cls.with_related(related).async_get(**kwargs)
+
+    @classmethod
+    def get(cls, related=None, **kwargs):
+        return cls.with_related(related).get(**kwargs)
+
+    @classmethod
+    async def from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
+        if cls._batch_lookups and related is None and isinstance(discord_obj, cls._discord_cls):
+            try:
+                obj = await BatchLoader.for_model(cls).load(discord_obj.id)
+            except cls.DoesNotExist:
+                if not create_if_new:
+                    raise
+            else:
+                obj._discord_obj = discord_obj
+                return obj, True
+        return await cls._from_discord_obj(discord_obj, create_if_new=create_if_new, related=related)
+
+    @classmethod
+    @async_writing_db
+    def _from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
+        obj, existed_already = cls.sync_from_discord_obj(discord_obj, create_if_new=create_if_new, related=related)
         return obj, existed_already
 
     @classmethod
-    def sync_from_discord_obj(cls, discord_obj, create_if_new=True):
+    @async_writing_db
+    def from_discord_objs(cls, discord_objs, create_if_new=True, skip_unregistered=False, related=None):
+        return cls.sync_from_discord_objs(discord_objs, create_if_new=create_if_new,
+                                          skip_unregistered=skip_unregistered, related=related)
+
+    @classmethod
+    def _attach_discord_obj(cls, obj, discord_obj):
+        if not isinstance(discord_obj, discord.Object):
+            obj._discord_obj = discord_obj
+
+    @classmethod
+    def _bulk_attach(cls, discord_objs, keys, rows):
+        # every occurrence of a row gets its own instance
+        objs = []
+        seen = set()
+        for discord_obj, key in zip(discord_objs, keys):
+            obj = rows.get(key)
+            if obj is not None:
+                if key in seen:
+                    obj = copy.copy(obj)
+                seen.add(key)
+                cls._attach_discord_obj(obj, discord_obj)
+            objs.append(obj)
+        return objs
+
+    @classmethod
+    def _has_guild_field(cls):
+        return any(field.name == 'guild' for field in cls._meta.concrete_fields)
+
+    @classmethod
+    def _bulk_create_kwargs(cls, discord_obj):
+        """The field values of a new row for ``discord_obj`` when creating rows in bulk."""
+        kwargs = {'id': discord_obj.id}
+        guild = getattr(discord_obj, 'guild', None)
+        if guild is not None and cls._has_guild_field():
+            kwargs['guild_id'] = guild.id
+        return kwargs
+
+    @classmethod
+    def sync_from_discord_objs(cls, discord_objs, create_if_new=True, skip_unregistered=False, related=None):
+        """Create versa objects from many Discord objects in a constant number
+        of queries. The versa objects are returned in the same order."""
+        discord_classes = (cls._discord_cls, discord.Object) + cls._bulk_discord_classes
+        for discord_obj in discord_objs:
+            if not isinstance(discord_obj, discord_classes):
+                raise TypeError(f"discord_obj has to be a discord.{cls._discord_cls.__name__} "
+                                f"but a {type(discord_obj).__name__} was passed")
+
+        if create_if_new and cls._has_guild_field():
+            # the guilds have to exist before rows referencing them can be created
+            guilds = [discord_obj.guild for discord_obj in discord_objs
+                      if getattr(discord_obj, 'guild', None) is not None]
+            if guilds:
+                Guild.sync_from_discord_objs(guilds)
+
+        unique = {discord_obj.id: discord_obj for discord_obj in discord_objs}
+        queryset = cls.with_related(related)
+        rows = queryset.in_bulk(list(unique))
+        missing = [discord_obj for _id, discord_obj in unique.items() if _id not in rows]
+        if missing:
+            if not create_if_new:
+                raise cls.DoesNotExist(f"{cls._meta.object_name} matching query does not exist.")
+            cls.objects.bulk_create([cls(**cls._bulk_create_kwargs(discord_obj)) for discord_obj in missing],
+                                    ignore_conflicts=True)
+            rows.update(queryset.in_bulk([discord_obj.id for discord_obj in missing]))
+        return cls._bulk_attach(discord_objs, [discord_obj.id for discord_obj in discord_objs], rows)
+
+    @classmethod
+    def sync_from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
         """Create a versa object from a Discord object"""
         if not isinstance(discord_obj, (cls._discord_cls, discord.Object)):
             raise TypeError(f"discord_obj has to be a discord.{cls._discord_cls.__name__} "
                             f"but a {type(discord_obj).__name__} was passed")
         if create_if_new:
-            obj, created = cls.objects.get_or_create(id=discord_obj.id)
+            obj, created = cls.with_related(related).get_or_create(id=discord_obj.id)
         else:
-            obj = cls.objects.get(id=discord_obj.id)
+            obj = cls.with_related(related).get(id=discord_obj.id)
             created = False
         if not isinstance(discord_obj, discord.Object):
             obj._discord_obj = discord_obj
@@ -299,6 +467,18 @@ class DiscordModel(Model):
     async def fetch(self):
         raise NotImplemented
 
+    def _get_gateway_obj(self):
+        """Returns the Discord object of this row from the gateway cache
+        without making any requests, or ``None``."""
+        return None
+
+    def _attach_gateway_obj(self):
+        try:
+            self._discord_obj = self._get_gateway_obj()
+        except AttributeError:
+            # no core running
+            pass
+
     @property
     def is_fetched(self):
         return self._discord_obj is not None
@@ -307,7 +487,7 @@ class DiscordModel(Model):
     def discord(self):
         return self._discord_obj
 
-    @async_using_db
+    @async_writing_db
     def async_delete(self, using=None, keep_parents=True):
         self.delete(using=using, keep_parents=keep_parents)
 
@@ -337,7 +517,7 @@ class DiscordModel(Model):
 
 
 class User(DiscordModel):
-    id = fields.BigIntegerField(primary_key=True)
+    id = fields.SnowflakeField(primary_key=True)
     is_staff = fields.BooleanField(default=False, db_index=True)
     is_active = fields.BooleanField(default=True, db_index=True)
     register_message = fields.MessageField(blank=True, null=True, on_delete=fields.SET_NULL)
@@ -346,9 +526,18 @@ class User(DiscordModel):
     _discord_cls = discord.User
     _discord_converter_cls = converter.UserConverter
 
+    _row_cache = True
+
+    index = UserIndex()
+    """The IDs of all registered users known to this process; loaded by the
+    :class:`Core` on startup."""
+
+    def _get_gateway_obj(self):
+        return self._core.get_user(self.id)
+
     @classmethod
-    def sync_from_discord_obj(cls, discord_obj, create_if_new=True):
-        """Create a versa object from a Discord object"""
+    def _check_discord_obj(cls, discord_obj):
+        """Validates ``discord_obj`` and returns whether it is the bot user."""
         if not isinstance(discord_obj, (cls._discord_cls, discord.ClientUser,
                                         discord.Member, MockMember, discord.Object)):
             raise TypeError(f"discord_obj has to be a discord.{cls._discord_cls.__name__} "
@@ -357,25 +546,93 @@ class User(DiscordModel):
         if not isinstance(discord_obj, (MockMember, discord.Object)):
             # if self
             if discord_obj.id == discord_obj._state.user.id:
-                obj, _ = cls.objects.get_or_create(id=discord_obj.id)
-                return obj, True
+                return True
 
             if discord_obj.bot:
                 raise ValueError("Bot users cannot be stored in the database")
-        qs = cls.objects.filter(id=discord_obj.id)
-        existed_already = qs.exists()
-        if not existed_already:
-            raise UserDoesNotExist(user_id=discord_obj.id)
-        obj = qs.first()
+        return False
+
+    @classmethod
+    def _check_index(cls, user_id):
+        # rejects inactive users without touching the database; users missing
+        # from the index may have been registered by another process
+        if cls.index.loaded and cls.index.get(user_id) is False:
+            raise InactiveUser(user_id=user_id)
+
+    @classmethod
+    def _check_row(cls, user_id, obj):
+        """Raises if ``obj``, the row of ``user_id`` or ``None``, isn't an
+        active user and updates the index with it."""
+        if obj is None:
+            raise UserDoesNotExist(user_id=user_id)
+        cls.index.set(user_id, obj.is_active)
         if not obj.is_active:
-            raise InactiveUser(user_id=discord_obj.id)
+            raise InactiveUser(user_id=user_id)
+
+    @classmethod
+    def _attach_discord_obj(cls, obj, discord_obj):
         if isinstance(discord_obj, discord.Member):
             discord_obj = discord_obj._user
         if not isinstance(discord_obj, (MockMember, discord.Object)):
             obj._discord_obj = discord_obj
-        return obj, existed_already
 
-    @async_using_db
+    @classmethod
+    async def from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
+        if cls._check_discord_obj(discord_obj) or not cls.index.loaded or related is not None:
+            return await cls._from_discord_obj(discord_obj, create_if_new=create_if_new, related=related)
+        cls._check_index(discord_obj.id)
+        try:
+            obj = await BatchLoader.for_model(cls).load(discord_obj.id)
+        except cls.DoesNotExist:
+            obj = None
+        cls._check_row(discord_obj.id, obj)
+        cls._attach_discord_obj(obj, discord_obj)
+        return obj, True
+
+    @classmethod
+    def sync_from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
+        """Create a versa object from a Discord object"""
+        if cls._check_discord_obj(discord_obj):
+            obj, _ = cls.with_related(related).get_or_create(id=discord_obj.id)
+            return obj, True
+        cls._check_index(discord_obj.id)
+        obj = cls.with_related(related).filter(id=discord_obj.id).first()
+        cls._check_row(discord_obj.id, obj)
+        cls._attach_discord_obj(obj, discord_obj)
+        return obj, True
+
+    @classmethod
+    def sync_from_discord_objs(cls, discord_objs, create_if_new=True, skip_unregistered=False, related=None):
+        """Create versa objects from many Discord objects in a constant number
+        of queries. The versa objects are returned in the same order.
+
+        Unregistered and inactive users raise as in :meth:`sync_from_discord_obj`
+        unless ``skip_unregistered`` is true, in which case ``None`` is returned
+        in their place.
+        """
+        user_ids = set()
+        for discord_obj in discord_objs:
+            if cls._check_discord_obj(discord_obj):
+                cls.objects.get_or_create(id=discord_obj.id)
+                user_ids.add(discord_obj.id)
+            elif not cls.index.loaded or cls.index.get(discord_obj.id) is not False:
+                user_ids.add(discord_obj.id)
+        rows = cls.with_related(related).in_bulk(list(user_ids)) if user_ids else {}
+        for user_id, obj in rows.items():
+            cls.index.set(user_id, obj.is_active)
+        for discord_obj in discord_objs:
+            obj = rows.get(discord_obj.id)
+            if obj is not None and obj.is_active:
+                continue
+            if skip_unregistered:
+                rows.pop(discord_obj.id, None)
+            elif obj is None:
+                raise UserDoesNotExist(user_id=discord_obj.id)
+            else:
+                raise InactiveUser(user_id=discord_obj.id)
+        return cls._bulk_attach(discord_objs, [discord_obj.id for discord_obj in discord_objs], rows)
+
+    @async_writing_db
     def async_delete(self, using=None, keep_parents=False):
         self.delete(using=using, keep_parents=keep_parents)
 
@@ -412,8 +669,20 @@ class User(DiscordModel):
         return discord_user
 
 
+def _index_saved_user(sender, instance, **kwargs):
+    User.index.set(instance.id, instance.is_active)
+
+
+def _unindex_deleted_user(sender, instance, **kwargs):
+    User.index.discard(instance.id)
+
+
+post_save.connect(_index_saved_user, sender=User)
+post_delete.connect(_unindex_deleted_user, sender=User)
+
+
 class Guild(DiscordModel):
-    id = fields.BigIntegerField(primary_key=True)
+    id = fields.SnowflakeField(primary_key=True)
     home = fields.BooleanField(default=False)
     # shard_id = fields.SmallIntegerField(db_index=True)
     register_time = fields.DateTimeField(auto_now_add=True)
@@ -426,6 +695,14 @@ class Guild(DiscordModel):
 
 
     _discord_cls = discord.Guild
+    _batch_lookups = True
+    _row_cache = True
+
+    prefix_table = PrefixTable()
+    """The prefixes of all guilds; loaded by the :class:`Core` on startup."""
+
+    def _get_gateway_obj(self):
+        return self._core.get_guild(self.id)
 
     @property
     def invite_url(self):
@@ -463,19 +740,96 @@ class Guild(DiscordModel):
         self._discord_obj = discord_guild
         return discord_guild
 
+    @classmethod
+    @async_writing_db
+    def async_sync_gateway_state(cls, discord_guild, prune=False):
+        return cls.sync_gateway_state(discord_guild, prune=prune)
+
+    @classmethod
+    def sync_gateway_state(cls, discord_guild, prune=False):
+        """Diffs the stored channels, roles and emojis of a guild against
+        its gateway state and applies the differences in bulk, using a
+        constant number of queries per guild.
+
+        Missing rows are created. Emojis are not tied to a guild in the
+        database, so they are only created and updated.
+
+        :param bool prune:
+            Whether to delete the rows of channels and roles missing from
+            the gateway state. Deleting cascades to every row referencing
+            them (e.g. messages), so only prune with a complete gateway state.
+        """
+        guild = cls.sync_from_discord_objs([discord_guild])[0]
+        for model, discord_objs in ((TextChannel, discord_guild.text_channels),
+                                    (VoiceChannel, discord_guild.voice_channels),
+                                    (CategoryChannel, discord_guild.categories),
+                                    (Role, discord_guild.roles)):
+            stored_ids = set(model.objects.filter(guild_id=discord_guild.id).values_list('id', flat=True))
+            gateway_ids = {discord_obj.id for discord_obj in discord_objs}
+            stale_ids = stored_ids - gateway_ids
+            if prune and stale_ids:
+                model.objects.filter(pk__in=stale_ids).delete()
+            new = [model(**model._bulk_create_kwargs(discord_obj)) for discord_obj in discord_objs
+                   if discord_obj.id not in stored_ids]
+            if new:
+                model.objects.bulk_create(new, ignore_conflicts=True)
+
+        discord_emojis = {emoji.id: emoji for emoji in discord_guild.emojis}
+        if discord_emojis:
+            stored_emojis = Emoji.objects.in_bulk(list(discord_emojis))
+            changed = []
+            for emoji in stored_emojis.values():
+                discord_emoji = discord_emojis[emoji.id]
+                if emoji.name != discord_emoji.name or emoji.animated != discord_emoji.animated:
+                    emoji.name = discord_emoji.name
+                    emoji.animated = discord_emoji.animated
+                    changed.append(emoji)
+            if changed:
+                Emoji.objects.bulk_update(changed, ['name', 'animated'])
+            new = [Emoji(id=emoji.id, name=emoji.name, animated=emoji.animated, is_custom=True)
+                   for emoji in discord_emojis.values() if emoji.id not in stored_emojis]
+            if new:
+                Emoji.objects.bulk_create(new, ignore_conflicts=True)
+        return guild
+
+
+def _update_guild_prefix(sender, instance, update_fields=None, **kwargs):
+    if 'prefix' in instance.__dict__ and (update_fields is None or 'prefix' in update_fields):
+        Guild.prefix_table.set(instance.id, instance.prefix)
+
+
+def _forget_guild_prefix(sender, instance, **kwargs):
+    Guild.prefix_table.discard(instance.id)
+
+
+post_save.connect(_update_guild_prefix, sender=Guild)
+post_delete.connect(_forget_guild_prefix, sender=Guild)
+
 
 class TextChannel(DiscordModel):
     # can also be a DMChannel
-    id = fields.BigIntegerField(primary_key=True)
+    id = fields.SnowflakeField(primary_key=True)
     guild = fields.GuildField(db_index=True, null=True, blank=True, on_delete=fields.CASCADE)
     is_dm = fields.BooleanField(default=False)
     language = fields.LanguageField()
 
     _discord_cls = discord.TextChannel
     _discord_converter_cls = converter.TextChannelConverter
+    _batch_lookups = True
+    _bulk_discord_classes = (discord.DMChannel,)
+    _related_plan = ('guild',)
+
+    def _get_gateway_obj(self):
+        return self._core.get_channel(self.id)
+
+    @classmethod
+    def _bulk_create_kwargs(cls, discord_obj):
+        kwargs = super()._bulk_create_kwargs(discord_obj)
+        kwargs['is_dm'] = isinstance(discord_obj, discord.DMChannel)
+        return kwargs
 
     @classmethod
-    def sync_from_discord_obj(cls, discord_obj, create_if_new=True):
+    def sync_from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
         """Create a versa object from a Discord object"""
         if not isinstance(discord_obj, cls._discord_cls):
             if isinstance(discord_obj, discord.DMChannel):
@@ -491,14 +845,16 @@ class TextChannel(DiscordModel):
             if create_if_new:
                 obj, created = cls.objects.get_or_create(id=discord_obj.id, is_dm=True)
             else:
-                obj = cls.objects.get(id=discord_obj.id)
+                obj = cls.with_related(related).get(id=discord_obj.id)
                 created = False
         else:
             if create_if_new:
                 guild, _ = Guild.sync_from_discord_obj(discord_obj.guild)
                 obj, created = cls.objects.get_or_create(id=discord_obj.id, guild=guild, is_dm=False)
+                # the guild is at hand already, no need to join it
+                obj.guild = guild
             else:
-                obj = cls.objects.get(id=discord_obj.id)
+                obj = cls.with_related(related).get(id=discord_obj.id)
                 # obj.guild._discord_obj = discord_obj.guild
                 created = False
 
@@ -526,14 +882,19 @@ class TextChannel(DiscordModel):
 
 
 class VoiceChannel(DiscordModel):
-    id = fields.BigIntegerField(primary_key=True)
+    id = fields.SnowflakeField(primary_key=True)
     guild = fields.GuildField(db_index=True, on_delete=fields.CASCADE)
 
     _discord_cls = discord.VoiceChannel
     _discord_converter_cls = converter.VoiceChannelConverter
+    _batch_lookups = True
+    _related_plan = ('guild',)
+
+    def _get_gateway_obj(self):
+        return self._core.get_channel(self.id)
 
     @classmethod
-    def sync_from_discord_obj(cls, discord_obj, create_if_new=True):
+    def sync_from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
         """Create a versa object from a Discord object"""
         if not isinstance(discord_obj, cls._discord_cls):
             raise TypeError(f"discord_obj has to be a discord.{cls._discord_cls.__name__} "
@@ -541,8 +902,10 @@ class VoiceChannel(DiscordModel):
         if create_if_new:
             guild, _ = Guild.sync_from_discord_obj(discord_obj.guild, create_if_new=create_if_new)
             obj, created = cls.objects.get_or_create(id=discord_obj.id, guild=guild)
+            # the guild is at hand already, no need to join it
+            obj.guild = guild
         else:
-            obj = cls.objects.get(id=discord_obj.id)
+            obj = cls.with_related(related).get(id=discord_obj.id)
             # obj.guild._discord_obj = discord_obj.guild
             created = False
 
@@ -560,14 +923,19 @@ class VoiceChannel(DiscordModel):
 
 
 class CategoryChannel(DiscordModel):
-    id = fields.BigIntegerField(primary_key=True)
+    id = fields.SnowflakeField(primary_key=True)
     guild = fields.GuildField(db_index=True, on_delete=fields.CASCADE)
 
     _discord_cls = discord.CategoryChannel
     _discord_converter_cls = converter.CategoryChannelConverter
+    _batch_lookups = True
+    _related_plan = ('guild',)
+
+    def _get_gateway_obj(self):
+        return self._core.get_channel(self.id)
 
     @classmethod
-    def sync_from_discord_obj(cls, discord_obj, create_if_new=True):
+    def sync_from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
         """Create a versa object from a Discord object"""
         if not isinstance(discord_obj, cls._discord_cls):
             raise TypeError(f"discord_obj has to be a discord.{cls._discord_cls.__name__} "
@@ -575,8 +943,10 @@ class CategoryChannel(DiscordModel):
         if create_if_new:
             guild, _ = Guild.sync_from_discord_obj(discord_obj.guild, create_if_new=create_if_new)
             obj, created = cls.objects.get_or_create(id=discord_obj.id, guild=guild)
+            # the guild is at hand already, no need to join it
+            obj.guild = guild
         else:
-            obj = cls.objects.get(id=discord_obj.id)
+            obj = cls.with_related(related).get(id=discord_obj.id)
             # obj.guild._discord_obj = discord_obj.guild
             created = False
 
@@ -594,14 +964,16 @@ class CategoryChannel(DiscordModel):
 
 
 class Role(DiscordModel):
-    id = fields.BigIntegerField(primary_key=True)
+    id = fields.SnowflakeField(primary_key=True)
     guild = fields.GuildField(db_index=True, on_delete=fields.CASCADE)
 
     _discord_cls = discord.Role
     _discord_converter_cls = converter.RoleConverter
+    _batch_lookups = True
+    _related_plan = ('guild',)
 
     @classmethod
-    def sync_from_discord_obj(cls, discord_obj, create_if_new=True):
+    def sync_from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
         """Create a versa object from a Discord object"""
         if not isinstance(discord_obj, cls._discord_cls):
             raise TypeError(f"discord_obj has to be a discord.{cls._discord_cls.__name__} "
@@ -609,8 +981,10 @@ class Role(DiscordModel):
         if create_if_new:
             guild, _ = Guild.sync_from_discord_obj(discord_obj.guild, create_if_new=create_if_new)
             obj, created = cls.objects.get_or_create(id=discord_obj.id, guild=guild)
+            # the guild is at hand already, no need to join it
+            obj.guild = guild
         else:
-            obj = cls.objects.get(id=discord_obj.id)
+            obj = cls.with_related(related).get(id=discord_obj.id)
             # obj.guild._discord_obj = discord_obj.guild
             created = False
 
@@ -618,12 +992,8 @@ class Role(DiscordModel):
         return obj, not created
 
     async def fetch(self) -> discord.Role:
-        # if not self.guild.is_fetched:
-        #     await self.guild.fetch()
-        guild = await self.guild
-        await guild.fetch()
-        roles = await guild.fetch_roles()
-        discord_role = discord.utils.get(roles, id=self.id)
+        # gateway cache first, then a short-lived cache of REST results
+        discord_role = await self._core.resolve_role(await self.guild_id, self.id)
         self._discord_obj = discord_role
         return discord_role
 
@@ -637,8 +1007,16 @@ class Emoji(DiscordModel):
     _discord_cls = discord.PartialEmoji
     _discord_converter_cls = converter.PartialEmojiConverter
 
+    def _get_gateway_obj(self):
+        if not self.is_custom:
+            return discord.PartialEmoji(name=self.name)
+        emoji = self._core.get_emoji(self.id)
+        if emoji is None:
+            return None
+        return discord.PartialEmoji(name=emoji.name, animated=emoji.animated, id=emoji.id)
+
     @classmethod
-    def sync_from_discord_obj(cls, discord_obj, create_if_new=True):
+    def sync_from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
         """Create a versa object from a Discord object"""
         if not isinstance(discord_obj, (cls._discord_cls, discord.Emoji)):
             raise TypeError(f"discord_obj has to be a discord.{cls._discord_cls.__name__} "
@@ -646,26 +1024,68 @@ class Emoji(DiscordModel):
                             f"but a {type(discord_obj).__name__} was passed")
         if isinstance(discord_obj, discord.Emoji):
             discord_obj = discord.PartialEmoji(name=discord_obj.name, animated=discord_obj.animated, id=discord_obj.id)
+        queryset = cls.with_related(related)
         if discord_obj.is_custom_emoji():
-            obj, created = cls.objects.get_or_create(id=discord_obj.id, name=discord_obj.name,
-                                                     animated=discord_obj.animated, is_custom=True)
+            obj, created = queryset.get_or_create(id=discord_obj.id, name=discord_obj.name,
+                                                  animated=discord_obj.animated, is_custom=True)
         else:
-            obj, created = cls.objects.get_or_create(name=discord_obj.name, animated=False, is_custom=False)
+            obj, created = queryset.get_or_create(name=discord_obj.name, animated=False, is_custom=False)
 
         obj._discord_obj = discord_obj
         return obj, not created
 
+    @classmethod
+    def sync_from_discord_objs(cls, discord_objs, create_if_new=True, skip_unregistered=False, related=None):
+        """Create versa objects from many Discord objects in a constant number
+        of queries. The versa objects are returned in the same order."""
+        partial_emojis = []
+        for discord_obj in discord_objs:
+            if not isinstance(discord_obj, (cls._discord_cls, discord.Emoji)):
+                raise TypeError(f"discord_obj has to be a discord.{cls._discord_cls.__name__} "
+                                f"or discord.Emoji"
+                                f"but a {type(discord_obj).__name__} was passed")
+            if isinstance(discord_obj, discord.Emoji):
+                discord_obj = discord.PartialEmoji(name=discord_obj.name, animated=discord_obj.animated,
+                                                   id=discord_obj.id)
+            partial_emojis.append(discord_obj)
+
+        # custom emojis are identified by their ID, unicode emojis by their name
+        keys = [emoji.id if emoji.is_custom_emoji() else emoji.name for emoji in partial_emojis]
+        custom = {emoji.id: emoji for emoji in partial_emojis if emoji.is_custom_emoji()}
+        names = {emoji.name for emoji in partial_emojis if not emoji.is_custom_emoji()}
+
+        queryset = cls.with_related(related)
+
+        def fetch_rows(ids, _names):
+            rows = queryset.in_bulk(list(ids)) if ids else {}
+            if _names:
+                rows.update((obj.name, obj) for obj in queryset.filter(name__in=_names, is_custom=False))
+            return rows
+
+        rows = fetch_rows(custom, names)
+        missing_ids = [_id for _id in custom if _id not in rows]
+        missing_names = [name for name in names if name not in rows]
+        if missing_ids or missing_names:
+            cls.objects.bulk_create([cls(id=_id, name=custom[_id].name, animated=custom[_id].animated, is_custom=True)
+                                     for _id in missing_ids]
+                                    + [cls(name=name, animated=False, is_custom=False) for name in missing_names],
+                                    ignore_conflicts=True)
+            rows.update(fetch_rows(missing_ids, missing_names))
+        return cls._bulk_attach(partial_emojis, keys, rows)
+
     async def fetch(self) -> discord.PartialEmoji:
         if self.is_custom:
-            # if not self.guild.is_fetched:
-            #     await self.guild.fetch()
-            guild = await self.guild
-            await guild.fetch()
-            emoji = await guild.fetch_emoji(self.id)
-            discord_emoji = discord.PartialEmoji(name=emoji.name, animated=emoji.animated, id=emoji.id)
-            if self.name != emoji.name:
-                self.name = emoji.name
-                await self.async_save()
+            # emojis aren't tied to a guild in the database, so only the
+            # gateway cache can tell whether a custom emoji was renamed
+            emoji = self._core.get_emoji(self.id)
+            if emoji is not None:
+                discord_emoji = discord.PartialEmoji(name=emoji.name, animated=emoji.animated, id=emoji.id)
+                if self.name != emoji.name or self.animated != emoji.animated:
+                    self.name = emoji.name
+                    self.animated = emoji.animated
+                    await self.async_save(update_fields=['name', 'animated'])
+            else:
+                discord_emoji = discord.PartialEmoji(name=self.name, animated=self.animated, id=self.id)
         else:
             discord_emoji = discord.PartialEmoji(name=self.name)
         self._discord_obj = discord_emoji
@@ -683,6 +1103,7 @@ class Member(DiscordModel):
 
     _discord_cls = discord.Member
     _discord_converter_cls = converter.MemberConverter
+    _related_plan = ('user', 'guild')
 
     def __getattr__(self, name):
         if name == 'id':
@@ -691,25 +1112,166 @@ class Member(DiscordModel):
                 return self._discord_obj.id
         return super().__getattr__(name)
 
+    # (user_id, guild_id) -> auto_id of the members known to exist, written
+    # from the database threads
+    _auto_ids = OrderedDict()
+    _auto_ids_max_size = 100000
+    _auto_ids_lock = threading.Lock()
+
     @classmethod
-    def sync_from_discord_obj(cls, discord_obj, create_if_new=True):
-        """Create a versa object from a Discord object"""
+    def _check_discord_obj(cls, discord_obj):
         if not isinstance(discord_obj, (discord.Member, MockMember)):
             raise TypeError(f"discord_obj has to be a discord.Member "
                             f"but a {type(discord_obj).__name__} was passed")
+
+    @classmethod
+    def _cache_auto_id(cls, user_id, guild_id, auto_id):
+        with cls._auto_ids_lock:
+            if (user_id, guild_id) not in cls._auto_ids and len(cls._auto_ids) >= cls._auto_ids_max_size:
+                # evict the oldest entry
+                cls._auto_ids.popitem(last=False)
+            cls._auto_ids[(user_id, guild_id)] = auto_id
+
+    @classmethod
+    def _forget_auto_id(cls, user_id, guild_id):
+        with cls._auto_ids_lock:
+            cls._auto_ids.pop((user_id, guild_id), None)
+
+    @classmethod
+    def _from_ids(cls, auto_id, user, guild, discord_obj):
+        # the user and guild are at hand already, so no query is needed
+        obj = cls.from_db(cls.objects.db, ('auto_id', 'user_id', 'guild_id'), (auto_id, user.id, guild.id))
+        obj.user = user
+        obj.guild = guild
+        obj._is_loaded = True
+        obj._discord_obj = discord_obj
+        return obj
+
+    @classmethod
+    def get_or_create_auto_id(cls, user_id, guild_id, create_if_new=True):
+        """Returns the ``auto_id`` of the member with the given user and guild,
+        creating the member if it does not exist and ``create_if_new`` is true,
+        as well as whether the member existed already.
+
+        Uses a single ``INSERT ... ON CONFLICT DO NOTHING`` statement where
+        the database supports it, followed by a ``SELECT`` if the member
+        existed already.
+        """
+        auto_id = cls._auto_ids.get((user_id, guild_id))
+        if auto_id is not None:
+            return auto_id, True
+
+        connection = connections[cls.objects.db]
+        existed_already = None
+        if create_if_new and (connection.vendor == 'postgresql'
+                              or (connection.vendor == 'sqlite' and sqlite3.sqlite_version_info >= (3, 35, 0))):
+            qn = connection.ops.quote_name
+            table = qn(cls._meta.db_table)
+            pk = qn(cls._meta.pk.column)
+            user = qn(cls._meta.get_field('user').column)
+            guild = qn(cls._meta.get_field('guild').column)
+            with connection.cursor() as cursor:
+                # returns no row if the member exists, without locking or rewriting it
+                cursor.execute(f"INSERT INTO {table} ({user}, {guild}) VALUES (%s, %s) "
+                               f"ON CONFLICT ({user}, {guild}) DO NOTHING RETURNING {pk}", (user_id, guild_id))
+                row = cursor.fetchone()
+                if row is not None:
+                    auto_id, existed_already = row[0], False
+
+        if existed_already is None:
+            auto_id = cls.objects.filter(user_id=user_id, guild_id=guild_id).values_list('pk', flat=True).first()
+            if auto_id is not None:
+                existed_already = True
+            elif create_if_new:
+                auto_id = cls.objects.create(user_id=user_id, guild_id=guild_id).pk
+                existed_already = False
+            else:
+                raise cls.DoesNotExist(f"{cls._meta.object_name} matching query does not exist.")
+
+        cls._cache_auto_id(user_id, guild_id, auto_id)
+        return auto_id, existed_already
+
+    @classmethod
+    @async_writing_db
+    def async_get_or_create_auto_id(cls, user_id, guild_id, create_if_new=True):
+        return cls.get_or_create_auto_id(user_id, guild_id, create_if_new=create_if_new)
+
+    @classmethod
+    async def from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
+        # the user and guild are attached unless another plan is passed
+        cls._check_discord_obj(discord_obj)
+        _user, _ = await User.from_discord_obj(discord_obj)
+        _guild, _ = await Guild.from_discord_obj(discord_obj.guild, create_if_new=create_if_new)
+        auto_id = cls._auto_ids.get((_user.id, _guild.id))
+        if auto_id is not None:
+            existed_already = True
+        else:
+            auto_id, existed_already = await cls.async_get_or_create_auto_id(_user.id, _guild.id,
+                                                                             create_if_new=create_if_new)
+        if related is not None:
+            obj = await cls.async_get(related=related, pk=auto_id)
+            obj._discord_obj = discord_obj
+            return obj, existed_already
+        return cls._from_ids(auto_id, _user, _guild, discord_obj), existed_already
+
+    @classmethod
+    def sync_from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
+        """Create a versa object from a Discord object"""
+        cls._check_discord_obj(discord_obj)
         _user, _ = User.sync_from_discord_obj(discord_obj)
         _guild, _ = Guild.sync_from_discord_obj(discord_obj.guild, create_if_new=create_if_new)
         # workaround for the nonexistence of composite primary keys in Django
-        qs = cls.objects.filter(user=_user, guild=_guild)
-        if qs.exists():
-            obj = qs.first()
-            obj.load()
-            existed_already = True
-        elif create_if_new:
-            obj = cls.objects.create(user=_user, guild=_guild)
-            existed_already = False
-        obj._discord_obj = discord_obj
-        return obj, existed_already
+        auto_id, existed_already = cls.get_or_create_auto_id(_user.id, _guild.id, create_if_new=create_if_new)
+        if related is not None:
+            obj = cls.get(related=related, pk=auto_id)
+            obj._discord_obj = discord_obj
+            return obj, existed_already
+        return cls._from_ids(auto_id, _user, _guild, discord_obj), existed_already
+
+    @classmethod
+    def sync_from_discord_objs(cls, discord_objs, create_if_new=True, skip_unregistered=False, related=None):
+        """Create versa objects from many Discord objects in a constant number
+        of queries. The versa objects are returned in the same order.
+
+        Members of unregistered and inactive users raise as in
+        :meth:`sync_from_discord_obj` unless ``skip_unregistered`` is true,
+        in which case ``None`` is returned in their place.
+        """
+        for discord_obj in discord_objs:
+            cls._check_discord_obj(discord_obj)
+        users = User.sync_from_discord_objs(discord_objs, skip_unregistered=skip_unregistered)
+        guilds = Guild.sync_from_discord_objs([discord_obj.guild for discord_obj in discord_objs],
+                                              create_if_new=create_if_new)
+        keys = {(user.id, guild.id) for user, guild in zip(users, guilds) if user is not None}
+        auto_ids = {key: cls._auto_ids.get(key) for key in keys}
+        auto_ids = {key: auto_id for key, auto_id in auto_ids.items() if auto_id is not None}
+
+        def fetch_auto_ids(_keys):
+            qs = cls.objects.filter(user_id__in={user_id for user_id, _ in _keys},
+                                    guild_id__in={guild_id for _, guild_id in _keys})
+            for user_id, guild_id, auto_id in qs.values_list('user_id', 'guild_id', 'pk'):
+                if (user_id, guild_id) in _keys:
+                    auto_ids[(user_id, guild_id)] = auto_id
+
+        missing = keys - auto_ids.keys()
+        if missing:
+            fetch_auto_ids(missing)
+            missing -= auto_ids.keys()
+        if missing:
+            if not create_if_new:
+                raise cls.DoesNotExist(f"{cls._meta.object_name} matching query does not exist.")
+            cls.objects.bulk_create([cls(user_id=user_id, guild_id=guild_id) for user_id, guild_id in missing],
+                                    ignore_conflicts=True)
+            fetch_auto_ids(missing)
+        for (user_id, guild_id), auto_id in auto_ids.items():
+            cls._cache_auto_id(user_id, guild_id, auto_id)
+
+        if related is not None:
+            rows = cls.with_related(related).in_bulk(list(auto_ids.values()))
+            return cls._bulk_attach(discord_objs, [auto_ids[(user.id, guild.id)] if user is not None else None
+                                                   for user, guild in zip(users, guilds)], rows)
+        return [cls._from_ids(auto_ids[(user.id, guild.id)], user, guild, discord_obj) if user is not None else None
+                for discord_obj, user, guild in zip(discord_objs, users, guilds)]
 
     async def fetch(self) -> discord.Member:
         # if not self.guild.is_fetched:
@@ -730,13 +1292,21 @@ class Member(DiscordModel):
         return hash(self.auto_id)
 
 
+def _forget_deleted_member(sender, instance, **kwargs):
+    Member._forget_auto_id(instance.user_id, instance.guild_id)
+
+
+post_delete.connect(_forget_deleted_member, sender=Member)
+
+
 class Message(DiscordModel):
-    id = fields.BigIntegerField(primary_key=True)
+    id = fields.SnowflakeField(primary_key=True)
     channel = fields.TextChannelField(db_index=True, on_delete=fields.CASCADE)
     author = fields.UserField(db_index=True, on_delete=fields.CASCADE)
 
     _discord_cls = discord.Message
     _discord_converter_cls = converter.MessageConverter
+    _related_plan = ('channel__guild', 'author')
 
     @property
     def guild(self):
@@ -749,7 +1319,7 @@ class Message(DiscordModel):
         self.channel.guild = value
 
     @classmethod
-    def sync_from_discord_obj(cls, discord_obj, create_if_new=True):
+    def sync_from_discord_obj(cls, discord_obj, create_if_new=True, related=None):
         """Create a versa object from a Discord object"""
         if not isinstance(discord_obj, cls._discord_cls):
             raise TypeError(f"discord_obj has to be a discord.{cls._discord_cls.__name__} "
@@ -760,16 +1330,58 @@ class Message(DiscordModel):
         else:
             user = discord_obj.author
         author, _ = User.sync_from_discord_obj(user)
+        # the channel (with its guild) and the author are at hand already, so
+        # only another plan has to be joined
+        queryset = cls.with_related(related if related is not None else ())
         if create_if_new:
-            obj, created = cls.objects.get_or_create(id=discord_obj.id, channel=channel, author=author)
+            obj, created = queryset.get_or_create(id=discord_obj.id, channel=channel, author=author)
         else:
-            obj = cls.objects.get(id=discord_obj.id)
+            obj = queryset.get(id=discord_obj.id)
             created = False
+        if related is None:
+            obj.channel = channel
+            obj.author = author
         # obj.channel._discord_obj = discord_obj.channel
         # obj.user._discord_obj = user
         obj._discord_obj = discord_obj
         return obj, not created
 
+    @classmethod
+    def sync_from_discord_objs(cls, discord_objs, create_if_new=True, skip_unregistered=False, related=None):
+        """Create versa objects from many Discord objects in a constant number
+        of queries. The versa objects are returned in the same order.
+
+        Messages of unregistered and inactive users raise as in
+        :meth:`sync_from_discord_obj` unless ``skip_unregistered`` is true,
+        in which case ``None`` is returned in their place.
+        """
+        for discord_obj in discord_objs:
+            if not isinstance(discord_obj, cls._discord_cls):
+                raise TypeError(f"discord_obj has to be a discord.{cls._discord_cls.__name__} "
+                                f"but a {type(discord_obj).__name__} was passed")
+        channels = TextChannel.sync_from_discord_objs([discord_obj.channel for discord_obj in discord_objs],
+                                                      create_if_new=create_if_new)
+        authors = User.sync_from_discord_objs([discord_obj.author._user if discord_obj.guild else discord_obj.author
+                                               for discord_obj in discord_objs],
+                                              skip_unregistered=skip_unregistered)
+        wrappable = {discord_obj.id: (discord_obj, channel, author)
+                     for discord_obj, channel, author in zip(discord_objs, channels, authors) if author is not None}
+        # as in sync_from_discord_obj, only another plan than the default one has to be joined
+        queryset = cls.with_related(related if related is not None else ())
+        rows = queryset.in_bulk(list(wrappable))
+        missing = [_id for _id in wrappable if _id not in rows]
+        if missing:
+            if not create_if_new:
+                raise cls.DoesNotExist(f"{cls._meta.object_name} matching query does not exist.")
+            cls.objects.bulk_create([cls(id=_id, channel=wrappable[_id][1], author=wrappable[_id][2])
+                                     for _id in missing], ignore_conflicts=True)
+            rows.update(queryset.in_bulk(missing))
+        if related is None:
+            for _id, obj in rows.items():
+                _, obj.channel, obj.author = wrappable[_id]
+        return cls._bulk_attach(discord_objs, [discord_obj.id if discord_obj.id in wrappable else None
+                                               for discord_obj in discord_objs], rows)
+
     async def fetch(self) -> discord.Message:
         # if not self.channel.is_fetched:
         #     await self.channel.fetch()
@@ -0,0 +1,141 @@
+"""versa-framework: A framework to make discord bots
+
+:copyright: (c) 2022 devcbezerra.
+:license: Apache-2.0 OR MIT
+"""
+
+import asyncio
+import os
+import zlib
+
+from .cache import get_cache
+from .utils import get_calling_loop, get_running_loop
+
+
+class RowCache:
+    """Read-through cache of model rows keyed by model and primary key,
+    stored in the ``rows`` namespace of the versa cache.
+
+    Rows are stored as a list of their prepared field values in the
+    order of the model's concrete fields. The cache key contains a
+    checksum of the field names so processes with different versions of
+    a model never read each other's rows.
+
+    Only models with ``_row_cache = True`` are cached. Their rows are
+    invalidated on ``post_save`` and ``post_delete``; bulk operations such
+    as ``QuerySet.update`` send no signals, so their changes become
+    visible once the cached row expires after ``ttl`` seconds. Rows read
+    from the database while a row of the same model was invalidated
+    aren't cached, see :meth:`generation`.
+
+    :param int ttl:
+        How long (in seconds) rows are kept.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.loop = get_running_loop()
+        self._backend = None
+        self._key_prefixes = {}
+        self._invalidations = set()
+        self._generations = {}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = get_cache('rows')
+        return self._backend
+
+    def key(self, model, pk):
+        try:
+            prefix = self._key_prefixes[model]
+        except KeyError:
+            attnames = ','.join(field.attname for field in model._meta.concrete_fields)
+            prefix = self._key_prefixes[model] = f'{model._meta.label_lower}:{zlib.crc32(attnames.encode()):x}'
+        return f'{prefix}:{pk}'
+
+    @staticmethod
+    def encode(obj):
+        values = []
+        for field in obj._meta.concrete_fields:
+            # read past the async descriptors, which return awaitables on the loop's thread
+            value = field.get_prep_value(obj.__dict__[field.attname])
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        return values
+
+    def generation(self, model):
+        """Returns the number of invalidations of ``model``'s rows so far;
+        pass it to :meth:`set_many` along with the rows read afterwards."""
+        return self._generations.get(model, 0)
+
+    @staticmethod
+    def decode(model, values, using):
+        fields = model._meta.concrete_fields
+        obj = model.from_db(using, [field.attname for field in fields],
+                            [field.to_python(value) for field, value in zip(fields, values)])
+        attach_gateway_obj = getattr(obj, '_attach_gateway_obj', None)
+        if attach_gateway_obj is not None:
+            attach_gateway_obj()
+        return obj
+
+    async def get_many(self, model, pks, using):
+        """Returns a dict of the cached rows of ``pks`` as instances read from
+        the database ``using``; cache errors count as misses."""
+        self.loop = asyncio.get_running_loop()
+        if self._invalidations:
+            # rows written on the loop's thread must not be read before they are removed
+            await asyncio.gather(*self._invalidations, return_exceptions=True)
+        try:
+            values = await self.backend.multi_get([self.key(model, pk) for pk in pks])
+        except Exception:
+            return {}
+        return {pk: self.decode(model, _values, using) for pk, _values in zip(pks, values) if _values is not None}
+
+    async def set_many(self, model, objs, generation):
+        """Caches ``objs`` unless a row of ``model`` has been invalidated since
+        :meth:`generation` returned ``generation``, as they may be stale."""
+        if not objs or self.generation(model) != generation:
+            return
+        try:
+            await self.backend.multi_set([(self.key(model, obj.pk), self.encode(obj)) for obj in objs], ttl=self.ttl)
+        except Exception:
+            pass
+
+    def invalidate(self, model, pk):
+        """Removes a row from the cache without waiting for the removal.
+        The next :meth:`get_many` waits for it, so reads following the write
+        don't see the old row."""
+        self._generations[model] = self._generations.get(model, 0) + 1
+        loop = self.loop = self.loop or get_calling_loop()
+        if loop is None or not loop.is_running():
+            return
+        if get_running_loop() is loop:
+            self._schedule_delete(self.key(model, pk))
+        else:
+            # scheduled before the database thread returns to the loop
+            loop.call_soon_threadsafe(self._schedule_delete, self.key(model, pk))
+
+    def _schedule_delete(self, key):
+        task = self.loop.create_task(self._delete(key))
+        self._invalidations.add(task)
+        task.add_done_callback(self._invalidations.discard)
+
+    async def _delete(self, key):
+        try:
+            await self.backend.delete(key)
+        except Exception:
+            # the row expires after ttl seconds
+            pass
+
+
+_row_cache = None
+
+
+def get_row_cache():
+    """Returns the :class:`RowCache` or ``None`` if ``MODEL_CACHE`` is not enabled."""
+    global _row_cache
+    if _row_cache is None and os.getenv('MODEL_CACHE'):
+        _row_cache = RowCache(ttl=int(os.getenv('MODEL_CACHE_TTL', 300)))
+    return _row_cache
@@ -5,15 +5,22 @@
 """
 
 import asyncio
+import contextvars
 import copy
 import functools
+import os
 import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 import aiohttp
 from asgiref.sync import AsyncToSync, SyncToAsync
 from discord import Object
 from discord.errors import ConnectionClosed, GatewayNotFound, HTTPException
 from discord.utils import maybe_coroutine
+from django.db import connections
 
 
 def issubmodule(parent, child):
@@ -136,11 +143,224 @@ sync_to_async_threadsafe = SyncToAsyncThreadSafe
 async_to_sync = AsyncToSync
 
 
-class AsyncUsingDB(SyncToAsyncThreadSafe):
+ExecutorStats = namedtuple('ExecutorStats', 'queued running completed total_wait max_wait')
+
+
+class DatabaseExecutor:
+    """Runs the database operations of :data:`async_using_db` on a pool
+    of worker threads, each of which holds its own Django connection.
+
+    Reads are spread across ``max_workers`` threads. If ``serialize_writes``
+    is true, writes are funneled through one additional dedicated thread
+    instead, which is what backends with a database-level write lock
+    (such as SQLite) need.
+
+    :param Optional[int] max_workers:
+        The number of read threads. Defaults to the ``DB_THREADS``
+        environment variable or 4.
+    :param Optional[bool] serialize_writes:
+        Whether writes should run on a single thread. Defaults to the
+        ``DB_SERIALIZE_WRITES`` environment variable, or to ``True`` if
+        ``DB_TYPE`` is ``sqlite``.
+    """
+
+    def __init__(self, max_workers=None, serialize_writes=None):
+        if max_workers is None:
+            max_workers = int(os.getenv('DB_THREADS', 4))
+        if max_workers < 1:
+            raise ValueError("max_workers must be greater than 0")
+        if serialize_writes is None:
+            _serialize_writes = os.getenv('DB_SERIALIZE_WRITES')
+            if _serialize_writes is None:
+                serialize_writes = os.getenv('DB_TYPE', 'sqlite') == 'sqlite'
+            else:
+                serialize_writes = _serialize_writes.lower() in ('1', 'true', 'yes')
+        self.max_workers = max_workers
+        self.serialize_writes = serialize_writes
+        self._read_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='versa-db')
+        if serialize_writes:
+            self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='versa-db-write')
+        else:
+            self._write_executor = self._read_executor
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @property
+    def stats(self) -> ExecutorStats:
+        """The current queue depth, number of running operations,
+        number of completed operations as well as the total and
+        maximum time (in seconds) operations spent waiting for a thread.
+        """
+        with self._lock:
+            return ExecutorStats(self._queued, self._running, self._completed,
+                                 self._total_wait, self._max_wait)
+
+    def submit(self, fn, *args, write=False, **kwargs):
+        submitted_at = time.perf_counter()
+
+        def run():
+            waited = time.perf_counter() - submitted_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._total_wait += waited
+                if waited > self._max_wait:
+                    self._max_wait = waited
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        with self._lock:
+            self._queued += 1
+        executor = self._write_executor if write else self._read_executor
+        try:
+            return executor.submit(run)
+        except RuntimeError:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+    def shutdown(self, wait=True):
+        """Shuts the threads down once the queued operations are done, after
+        each thread has closed its database connections."""
+        executors = {self._read_executor: self.max_workers}
+        if self._write_executor is not self._read_executor:
+            executors[self._write_executor] = 1
+        for executor, workers in executors.items():
+            _close_connections(executor, workers)
+            executor.shutdown(wait=wait)
+
+
+def _close_connections(executor, workers):
+    """Makes each of the ``workers`` threads of ``executor`` close its
+    Django connections, which only the thread that opened them can close."""
+    # every thread blocks until all are busy, so each one runs exactly one close
+    barrier = threading.Barrier(workers)
+
+    def close():
+        try:
+            barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        connections.close_all()
+
+    try:
+        for _ in range(workers):
+            executor.submit(close)
+    except RuntimeError:
+        # shut down already
+        pass
+
+
+_db_executor = None
+
+_calling_loop = contextvars.ContextVar('versa_calling_loop', default=None)
+
+
+def get_running_loop():
+    """Returns the event loop running in the current thread or ``None``."""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_calling_loop():
+    """Returns the event loop that submitted the database operation running
+    in the current :class:`DatabaseExecutor` thread, or the running loop
+    outside of them."""
+    loop = _calling_loop.get()
+    return loop if loop is not None else get_running_loop()
+
+
+def get_db_executor() -> DatabaseExecutor:
+    """Returns the :class:`DatabaseExecutor` used by :data:`async_using_db`,
+    creating it on first use."""
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = DatabaseExecutor()
+    return _db_executor
+
+
+def set_db_executor(executor: DatabaseExecutor):
+    """Replaces the :class:`DatabaseExecutor` used by :data:`async_using_db`.
+    The previous executor is shut down without waiting for it."""
+    global _db_executor
+    if _db_executor is not None and _db_executor is not executor:
+        _db_executor.shutdown(wait=False)
+    _db_executor = executor
+
+
+def close_db_executor():
+    """Shuts the :class:`DatabaseExecutor` down without waiting for it; the
+    next database operation creates a new one."""
+    global _db_executor
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=False)
+        _db_executor = None
+
+
+class Resolved:
+    """An awaitable that is already done. Awaiting it returns ``value``
+    without suspending and without creating a coroutine.
+
+    :param value:
+        The result of the awaitable.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __await__(self):
+        return self.value
+        yield  # noqa, makes this a generator
+
+
+def run_in_db(func, *args, write=False, **kwargs):
+    """Runs ``func`` on the :class:`DatabaseExecutor` and returns an
+    :class:`asyncio.Future` of its result. Must be called from the
+    event loop's thread.
+
+    :param bool write:
+        Whether ``func`` writes to the database.
+    """
+    context = contextvars.copy_context()
+    context.run(_calling_loop.set, asyncio.get_running_loop())
+    future = get_db_executor().submit(context.run, func, *args, write=write, **kwargs)
+    return asyncio.wrap_future(future)
+
+
+class AsyncUsingDB:
+    write = False
+
+    def __init__(self, func):
+        self.func = func
+        functools.update_wrapper(self, func)
+
     @property
     def sync(self):
         return self.func
 
+    def __get__(self, parent, objtype=None):
+        func = functools.partial(self.__call__, parent)
+        return functools.update_wrapper(func, self.func)
+
+    async def __call__(self, *args, **kwargs):
+        return await run_in_db(self.func, *args, write=self.write, **kwargs)
+
+
+class AsyncWritingDB(AsyncUsingDB):
+    write = True
+
 
 async_using_db = AsyncUsingDB
 """Decorate (synchronous) functions with this to turn them into async functions
@@ -149,9 +369,75 @@ exception would be raised by Django. Do NOT decorate an async function with this
 as that would be not only redundant but would also stop this decorator from
 working as intended.
 
+The decorated function runs on one of the read threads of the
+:class:`DatabaseExecutor`.
+
 To use functions decorated with this synchronously, call ``decorated_function.sync``.
 """
 
+async_writing_db = AsyncWritingDB
+"""Like :data:`async_using_db`, but for functions that write to the database.
+These run on the dedicated write thread of the :class:`DatabaseExecutor`
+if it serializes writes.
+"""
+
+
+class CoalescingCache:
+    """Caches the results of the coroutine function ``fetch`` for ``ttl``
+    seconds and runs concurrent calls for the same key only once.
+
+    Meant for short-lived caching of Discord REST results. At most
+    :attr:`max_size` values are kept; the oldest one is evicted first.
+
+    :param Callable fetch:
+        The coroutine function that is called with a key to fetch its value.
+    :param float ttl:
+        How long (in seconds) fetched values are kept.
+    """
+
+    max_size = 1024
+
+    def __init__(self, fetch, ttl=60):
+        self._fetch = fetch
+        self.ttl = ttl
+        # in insertion order, which is also the order the values expire in
+        self._values = OrderedDict()
+        self._pending = {}
+
+    async def get(self, key):
+        try:
+            expires, value = self._values[key]
+        except KeyError:
+            pass
+        else:
+            if expires > time.monotonic():
+                return value
+            del self._values[key]
+
+        future = self._pending.get(key)
+        if future is None:
+            future = self._pending[key] = asyncio.ensure_future(self._load(key))
+        # a cancelled caller must not cancel the fetch for the other callers
+        return await asyncio.shield(future)
+
+    async def _load(self, key):
+        try:
+            value = await self._fetch(key)
+        finally:
+            del self._pending[key]
+        self._values.pop(key, None)
+        while len(self._values) >= self.max_size:
+            # evict the oldest value
+            self._values.popitem(last=False)
+        self._values[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._values.clear()
+        else:
+            self._values.pop(key, None)
+
 
 def merge_configs(default, overwrite):
     """From `cookiecutter <https://github.com/audreyr/cookiecutter>`__"""
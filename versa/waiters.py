@@ -0,0 +1,78 @@
+"""versa-framework: A framework to make discord bots
+
+:copyright: (c) 2022 devcbezerra.
+:license: Apache-2.0 OR MIT
+"""
+
+import asyncio
+
+
+class WaiterRegistry:
+    """Futures waiting for events, indexed by a key derived from the
+    event (e.g. ``(channel_id, user_id)`` of a message), so an event only
+    runs the checks of the waiters with the same key instead of those of
+    every pending :meth:`discord.Client.wait_for`.
+
+    Unlike :meth:`discord.Client.wait_for`, a check that raises only
+    fails its own waiter.
+    """
+
+    def __init__(self):
+        self._waiters = {}
+        self._open = 0
+
+    def __len__(self):
+        """The number of open waiters."""
+        return self._open
+
+    async def wait(self, key, check=None, timeout=None):
+        """Waits for the next event dispatched with ``key`` that passes
+        ``check`` and returns it.
+
+        :param key:
+            A hashable identifying the events waited for.
+        :param check:
+            A callable taking the event; ``None`` accepts every event.
+        :param timeout:
+            Seconds to wait before raising :exc:`asyncio.TimeoutError`;
+            ``None`` waits forever.
+        """
+        future = asyncio.get_running_loop().create_future()
+        waiter = (future, check)
+        self._waiters.setdefault(key, []).append(waiter)
+        self._open += 1
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._remove(key, waiter)
+
+    def _remove(self, key, waiter):
+        waiters = self._waiters.get(key)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            return
+        self._open -= 1
+        if not waiters:
+            del self._waiters[key]
+
+    def dispatch(self, key, event):
+        """Resolves the waiters of ``key`` whose check ``event`` passes."""
+        waiters = self._waiters.get(key)
+        if not waiters:
+            return
+        for waiter in tuple(waiters):
+            future, check = waiter
+            if future.done():
+                continue
+            try:
+                matches = check is None or check(event)
+            except Exception as e:
+                future.set_exception(e)
+                self._remove(key, waiter)
+                continue
+            if matches:
+                future.set_result(event)
+                self._remove(key, waiter)